@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+
+import numpy as np
+import librosa
+
+# energy thresholds are dB above the noise floor, flux thresholds are median absolute deviations
+DEFAULT_THRESHOLDS = {'energy': 10.0, 'flux': 3.0, 'off': 0.0}
+
+
+class ActivityGate:
+    """Drop silent or steady-noise regions of a clip before MFCC extraction.
+
+    `method='energy'` keeps frames whose RMS level (after pre-emphasis, which
+    suppresses low-frequency wind rumble) is `threshold` dB above the clip's
+    noise floor, estimated as a low percentile of the frame levels.
+    `method='flux'` keeps frames whose positive spectral flux exceeds the median
+    by `threshold` median absolute deviations, which tracks call onsets in
+    stationary noise. `threshold=None` picks the method's default from
+    `DEFAULT_THRESHOLDS`. Kept frames are widened by `hangover` seconds on each
+    side. `method='off'` passes audio through unchanged.
+
+    Gated clips yield different MFCC means than whole clips, so a gate used in
+    serving should also be used when building the training and evaluation
+    features (`features.py --gate`).
+    """
+
+    def __init__(self, method='energy', threshold=None, floor_db=-60.0, noise_percentile=20,
+                 frame_length=2048, hop_length=512, hangover=0.2, min_active=0.1, preemphasis=0.97):
+        if method not in ('energy', 'flux', 'off'):
+            raise ValueError(f'Unknown activity gate method: {method}')
+        self.method = method
+        self.threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        self.floor_db = floor_db
+        self.noise_percentile = noise_percentile
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.hangover = hangover
+        self.min_active = min_active
+        self.preemphasis = preemphasis
+        self.totals = {'clips': 0, 'no_activity': 0, 'seconds': 0.0, 'skipped_seconds': 0.0, 'gate_seconds': 0.0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(**cls.env_config())
+
+    @staticmethod
+    def env_config(method=None):
+        """Constructor arguments from the GATE_* variables, so offline features can match the server's gate."""
+        threshold = os.environ.get('GATE_THRESHOLD')
+        return {
+            'method': method or os.environ.get('GATE_METHOD', 'off'),
+            'threshold': float(threshold) if threshold else None,
+            'floor_db': float(os.environ.get('GATE_FLOOR_DB', -60.0)),
+            'hangover': float(os.environ.get('GATE_HANGOVER', 0.2)),
+            'min_active': float(os.environ.get('GATE_MIN_ACTIVE', 0.1)),
+        }
+
+    def frame_activity(self, audio, sr):
+        """Boolean mask over frames of `audio` (one per `hop_length` samples)."""
+        y = audio
+        if self.preemphasis:
+            y = np.append(audio[:1], audio[1:] - self.preemphasis * audio[:-1])
+        if len(y) < self.frame_length:
+            y = np.pad(y, (0, self.frame_length - len(y)))
+
+        if self.method == 'flux':
+            spec = np.log1p(np.abs(librosa.stft(y, n_fft=self.frame_length, hop_length=self.hop_length, center=False)))
+            flux = np.maximum(np.diff(spec, axis=1, prepend=spec[:, :1]), 0).sum(axis=0)
+            median = np.median(flux)
+            mad = np.median(np.abs(flux - median)) + 1e-10
+            active = flux > median + self.threshold * mad
+        else:
+            frames = librosa.util.frame(y, frame_length=self.frame_length, hop_length=self.hop_length)
+            power = np.einsum('ij,ij->j', frames, frames) / self.frame_length
+            level_db = 10 * np.log10(power + 1e-20)
+            noise_floor = np.percentile(level_db, self.noise_percentile)
+            active = level_db > max(noise_floor + self.threshold, self.floor_db)
+            # A clip that is loud throughout has no quiet frames to estimate the floor from
+            if not active.any() and level_db.min() > self.floor_db + self.threshold:
+                active[:] = True
+
+        width = int(round(self.hangover * sr / self.hop_length))
+        if width and active.any():
+            active = np.convolve(active, np.ones(2 * width + 1), mode='same') > 0
+        return active
+
+    def __call__(self, audio, sr):
+        """Return (active audio, stats); the active audio is empty when nothing qualifies."""
+        started = time.perf_counter()
+        duration = len(audio) / sr
+        if self.method == 'off' or not len(audio):
+            kept = audio
+        else:
+            active = self.frame_activity(audio, sr)
+            if active.all():
+                kept = audio
+            else:
+                mask = np.repeat(active, self.hop_length)
+                mask = np.pad(mask, (0, max(0, len(audio) - len(mask))), mode='edge')[:len(audio)]
+                kept = audio[mask]
+        if self.method != 'off' and len(kept) / sr < self.min_active:
+            kept = audio[:0]
+
+        elapsed = time.perf_counter() - started
+        skipped = duration - len(kept) / sr
+        with self._lock:
+            self.totals['clips'] += 1
+            self.totals['no_activity'] += int(not len(kept))
+            self.totals['seconds'] += duration
+            self.totals['skipped_seconds'] += skipped
+            self.totals['gate_seconds'] += elapsed
+        return kept, {
+            'duration': round(duration, 3),
+            'active_seconds': round(len(kept) / sr, 3),
+            'skipped_fraction': round(skipped / duration, 4) if duration else 0.0,
+            'gate_ms': round(elapsed * 1000, 2),
+        }
+
+    def stats(self):
+        with self._lock:
+            totals = dict(self.totals)
+        totals['skipped_fraction'] = round(totals['skipped_seconds'] / totals['seconds'], 4) if totals['seconds'] else 0.0
+        totals['method'] = self.method
+        totals['threshold'] = self.threshold
+        return totals
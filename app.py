@@ -1,52 +1,281 @@
 import os
+import hmac
 import json
+import time
+import atexit
+import hashlib
+import functools
+import resources
+# Size the BLAS/numba/TensorFlow thread pools (WORKER_THREADS, CPU_AFFINITY) before they are imported
+resources.configure_from_env()
 import librosa
 import cv2
 import numpy as np
-import tensorflow as tf
 from flask import Flask, request, Response, send_from_directory, jsonify
 from werkzeug.utils import secure_filename
 import base64
 from warnings import filterwarnings
+from flask_sock import Sock
+from model_registry import ModelRegistry
+from activity import ActivityGate
+from features import mfcc_mean
+from history import HistoryStore
+from memdiag import MemoryMonitor
+from streaming import StreamClassifier, PCM_FORMATS, decode_pcm
 
 filterwarnings('ignore')
 
 app = Flask(__name__)
-
-model = tf.keras.models.load_model('model.h5')
-with open('prediction.json', 'r') as f:
-    prediction_dict = json.load(f)
-
-UPLOAD_FOLDER = 'uploads'
+# Cap each streamed PCM chunk so per-connection memory stays bounded
+app.config['SOCK_SERVER_OPTIONS'] = {'ping_interval': 25, 'max_message_size': 1 << 20}
+sock = Sock(app)
+
+# Prefer the TensorFlow-free export (see export_npz.py) when it is available
+MODEL_PATH = os.environ.get('MODEL_PATH', 'model.npz' if os.path.exists('model.npz') else 'model.h5')
+# Versions in models/<version>/ are hot-loaded in the background; without them the file above is served
+registry = ModelRegistry(os.environ.get('MODELS_DIR', 'models'), default_model=MODEL_PATH).start()
+# Silence/noise gating before MFCC (GATE_METHOD=energy|flux, off by default); build training features with the same gate
+gate = ActivityGate.from_env()
+# Every upload's result is kept in SQLite; inserts are batched off the request path
+history = HistoryStore(os.environ.get('HISTORY_DB', 'history.db'))
+atexit.register(history.close)
+TOP_K = 5
+MAX_FEATURE_VECTORS = 10000
+# Model management and /admin endpoints need `Authorization: Bearer $ADMIN_TOKEN`; without it they are disabled
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+# RSS sampling and tracemalloc diffs (MEMDIAG_TRACEMALLOC=<frames>); MEMDIAG_MAX_RSS_MB recycles the worker
+memory = MemoryMonitor.from_env().start()
+
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Werkzeug enforces this on every request body, including chunked ones without a Content-Length
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('MAX_UPLOAD_MB', 50)) * 2 ** 20)
+
+@app.after_request
+def count_request(response):
+    memory.request_done()
+    return response
+
+def admin_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Admin endpoints are disabled; set ADMIN_TOKEN to enable them"}), 403
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({"error": "Invalid or missing admin token"}), 401
+        return view(*args, **kwargs)
+    return wrapper
 
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+def top_predictions(version, probs):
+    order = np.argsort(probs, axis=1)[:, ::-1][:, :TOP_K]
+    return [{"class": version.labels[str(row[0])], "confidence": round(float(p[row[0]]) * 100, 2),
+             "top_k": [{"class": version.labels[str(i)], "probability": round(float(p[i]), 6)} for i in row]}
+            for p, row in zip(probs, order)]
+
 def predict_audio(file_path):
+    started = time.perf_counter()
     audio, sr = librosa.load(file_path)
-    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-    mfcc = np.mean(mfcc, axis=1)
+    audio, activity = gate(audio, sr)
+    if not len(audio):
+        # Nothing but silence or steady noise: skip feature extraction and the model entirely
+        return {"class": None, "confidence": 0.0, "model_version": None, "top_k": [], "activity": activity,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    mfcc = mfcc_mean(audio, sr)
     mfcc = np.expand_dims(mfcc, axis=0)
     mfcc = np.expand_dims(mfcc, axis=2)
-    tensor = tf.convert_to_tensor(mfcc, dtype=tf.float32)
-
-    pred = model.predict(tensor)
-    label_index = np.argmax(pred)
-    confidence = round(float(np.max(pred)) * 100, 2)
-    class_name = prediction_dict[str(label_index)]
 
-    return class_name, confidence
+    version = registry.select()
+    result = top_predictions(version, version.predict(mfcc))[0]
+    result.update(model_version=version.name, activity=activity,
+                  latency_ms=round((time.perf_counter() - started) * 1000, 2))
+    return result
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_limited(stream, limit):
+    # Raw (e.g. de-chunked) input streams may return short reads before EOF
+    chunks, size = [], 0
+    while size < limit:
+        chunk = stream.read(min(1 << 16, limit - size))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b''.join(chunks)
 
 def encode_image(path):
     img = cv2.imread(path)
+    if img is None:
+        return ""
     img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     img = cv2.resize(img, (350, 300))
     _, buffer = cv2.imencode('.jpg', img)
     return f"data:image/jpeg;base64,{base64.b64encode(buffer).decode()}"
 
+@sock.route('/stream')
+def stream(ws):
+    # Binary messages are mono PCM chunks (?format=s16|f32, ?sr=22050); replies are JSON predictions
+    try:
+        sample_format = request.args.get('format', 's16')
+        if sample_format not in PCM_FORMATS:
+            raise ValueError(f'Unknown format {sample_format!r}; expected one of {", ".join(PCM_FORMATS)}')
+        classifier = StreamClassifier(
+            registry,
+            window=float(request.args.get('window', 5.0)),
+            hop=float(request.args.get('hop', 1.0)),
+            sr=int(request.args.get('sr', 22050)),
+        )
+    except ValueError as e:
+        ws.send(json.dumps({'error': str(e)}))
+        return
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+        if isinstance(message, str):
+            continue
+        try:
+            result = classifier.feed(decode_pcm(message, sample_format))
+        except ValueError as e:
+            ws.send(json.dumps({'error': str(e)}))
+            continue
+        if result is not None:
+            ws.send(json.dumps(result))
+
+@app.route('/models', methods=['GET'])
+def models_status():
+    return jsonify(registry.status())
+
+@app.route('/models/activate/<version>', methods=['POST'])
+@admin_required
+def models_activate(version):
+    try:
+        registry.activate(version)
+    except KeyError:
+        return jsonify({"error": f"Unknown model version: {version}"}), 404
+    except Exception as e:
+        app.logger.exception('Failed to load model version %s', version)
+        return jsonify({"error": f"Model version {version} failed to load: {e}"}), 422
+    return jsonify(registry.status())
+
+@app.route('/models/rollback', methods=['POST'])
+@admin_required
+def models_rollback():
+    try:
+        registry.rollback()
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(registry.status())
+
+@app.route('/models/split', methods=['POST'])
+@admin_required
+def models_split():
+    # {"version": "v2", "weight": 0.1} sends 10% of traffic to v2; an empty body clears the split
+    body = request.get_json(silent=True) or {}
+    try:
+        registry.split(body.get('version'), float(body.get('weight', 0.0)))
+    except KeyError:
+        return jsonify({"error": f"Unknown model version: {body.get('version')}"}), 404
+    except (TypeError, ValueError):
+        return jsonify({"error": "weight must be a number between 0 and 1"}), 400
+    except Exception as e:
+        app.logger.exception('Failed to load model version %s', body.get('version'))
+        return jsonify({"error": f"Model version {body.get('version')} failed to load: {e}"}), 422
+    return jsonify(registry.status())
+
+@app.route('/activity', methods=['GET'])
+def activity_stats():
+    return jsonify(gate.stats())
+
+@app.route('/features', methods=['POST'])
+def classify_features():
+    # Precomputed MFCC means (see edge_features.py): JSON {"features": [[40 floats], ...]} or packed
+    # little-endian float32 with Content-Type: application/octet-stream; scored in one forward pass
+    version = registry.select()
+    n_features = int(np.prod(version.input_shape))
+    max_bytes = MAX_FEATURE_VECTORS * n_features * 4 * 8
+    if (request.content_length or 0) > max_bytes:
+        return jsonify({"error": "Request body too large"}), 413
+    # Read at most one byte past the cap, so a chunked body without Content-Length cannot grow unbounded
+    body = read_limited(request.stream, max_bytes + 1)
+    if len(body) > max_bytes:
+        return jsonify({"error": "Request body too large"}), 413
+    if request.mimetype == 'application/octet-stream':
+        if len(body) % (n_features * 4):
+            return jsonify({"error": f"Body length must be a multiple of {n_features * 4} bytes"}), 400
+        x = np.frombuffer(body, dtype='<f4').reshape(-1, n_features)
+    else:
+        try:
+            payload = json.loads(body)
+        except (ValueError, RecursionError):
+            payload = None
+        features = payload.get('features') if isinstance(payload, dict) else payload
+        try:
+            x = np.asarray(features, dtype=np.float32)
+        except (TypeError, ValueError, RecursionError):
+            return jsonify({"error": "features must be numeric arrays"}), 400
+        # Accept one (40,) vector, (N, 40) or (N, 40, 1) -- not any shape that happens to flatten to 40
+        if x.shape == version.input_shape[:1]:
+            x = x[None]
+        if x.ndim == 2 and version.input_shape[1:] == (1,):
+            x = x[..., None]
+        if x.ndim != 3 or x.shape[1:] != version.input_shape:
+            return jsonify({"error": f"Each feature vector must have shape {list(version.input_shape)} "
+                                     f"or {[version.input_shape[0]]}"}), 400
+        x = x.reshape(len(x), n_features)
+    if not 0 < len(x) <= MAX_FEATURE_VECTORS:
+        return jsonify({"error": f"Send between 1 and {MAX_FEATURE_VECTORS} feature vectors"}), 400
+    if not np.isfinite(x).all():
+        return jsonify({"error": "Feature vectors must be finite"}), 400
+
+    probs = version.predict(x.reshape((len(x),) + version.input_shape))
+    response = jsonify({"model_version": version.name, "predictions": top_predictions(version, probs)})
+    response.headers['X-Model-Version'] = version.name
+    return response
+
+@app.route('/history', methods=['GET'])
+def history_list():
+    # Newest first; follow next_before_id to page back in time
+    try:
+        return jsonify(history.query(
+            limit=request.args.get('limit', 50, type=int),
+            before_id=request.args.get('before_id', type=int),
+            species=request.args.get('species'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+        ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/history/summary', methods=['GET'])
+def history_summary():
+    try:
+        summary = history.summary(request.args.get('since'), request.args.get('until'), request.args.get('bucket'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    summary['writer'] = history.stats()
+    return jsonify(summary)
+
+@app.route('/admin/memory', methods=['GET'])
+@admin_required
+def memory_report():
+    # ?snapshot=1 diffs a fresh tracemalloc snapshot now; ?objects=1 adds live object counts per type
+    if request.args.get('snapshot') and memory.trace_frames:
+        memory.snapshot()
+    return jsonify(memory.report(objects=bool(request.args.get('objects'))))
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     result_html = ""
@@ -61,9 +290,19 @@ def index():
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             file.save(filepath)
 
-            predicted_class, confidence = predict_audio(filepath)
-            image_path = os.path.join('Inference_Images', f'{predicted_class}.jpg')
-            image_encoded = encode_image(image_path)
+            result = predict_audio(filepath)
+            history.record(file_hash(filepath), result, filename)
+            predicted_class, confidence, model_version = result["class"], result["confidence"], result["model_version"]
+            if predicted_class is None:
+                prediction_html = "<h1>No bird detected</h1>"
+            else:
+                image_path = os.path.join('Inference_Images', f'{predicted_class}.jpg')
+                image_encoded = encode_image(image_path)
+                prediction_html = f"""
+                    <h2> {confidence:.2f}% Match</h2>
+                    <img src="{image_encoded}" alt="{predicted_class}" />
+                    <h1>{predicted_class}</h1>
+                """
 
             result_html = f"""
                 <div class="result">
@@ -72,15 +311,17 @@ def index():
                         <source src="/uploads/{filename}" type="audio/wav">
                         Your browser does not support the audio element.
                     </audio>
-                    <h2> {confidence:.2f}% Match</h2>
-                    <img src="{image_encoded}" alt="{predicted_class}" />
-                    <h1>{predicted_class}</h1>
+                    {prediction_html}
                 </div>
             """
             
             # Return only the result HTML if it's an AJAX request
             if is_ajax or request.headers.get('Accept') == 'application/json':
-                return jsonify({"result_html": result_html})
+                response = jsonify({"result_html": result_html, "model_version": model_version,
+                                    "activity": result["activity"]})
+                if model_version:
+                    response.headers['X-Model-Version'] = model_version
+                return response
 
     return Response(r"""
 <!DOCTYPE html>
@@ -928,4 +1169,4 @@ document.addEventListener('DOMContentLoaded', function() {
     """, mimetype='text/html')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=7860, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 7860)), debug=os.environ.get('FLASK_DEBUG', '1') == '1')
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""Augmented feature cache for training.
+
+Each audio file is decoded once in a worker process and expanded into the
+original MFCC mean plus `--variants` augmented ones (time shift, background
+noise mixing, gain, pitch shift). Randomness comes from a seed derived from
+(`--seed`, file index, variant), so a cache is reproducible regardless of the
+number of workers. Results are written as `.npz` shards next to a
+`manifest.json`, and a cache whose manifest matches the requested config and
+the source files' (mtime, size) is reused instead of rebuilt. Validation files are held out without augmentation. `--gate` applies the
+server's activity gate (tuned by the same `GATE_*` variables) to every clip.
+
+    python augment.py "Voice of Birds" augmented/ --variants 8 --noise-dir noise/ --workers 8
+
+`make_dataset("augmented/", "train")` then streams the shards through a
+prefetching tf.data pipeline for `model.fit`.
+"""
+import os
+import json
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import librosa
+
+from activity import ActivityGate
+from features import N_MFCC, gated_mfcc_mean, list_dataset
+
+DEFAULTS = {
+    'variants': 4,
+    'seed': 0,
+    'shard_size': 64,
+    'val_fraction': 0.1,
+    'max_shift': 0.5,       # fraction of the clip to roll by
+    'snr_db': (5.0, 20.0),
+    'gain_db': (-6.0, 6.0),
+    'pitch_steps': (-2.0, 2.0),
+    'pitch_prob': 0.5,
+    'noise_dir': None,
+    'gate': None,           # ActivityGate arguments, applied to every original and augmented clip
+}
+
+_noise_clips = None
+
+
+def load_noise(noise_dir, sr):
+    global _noise_clips
+    if _noise_clips is None:
+        _noise_clips = [librosa.load(path, sr=sr)[0] for path in sorted(glob.glob(os.path.join(noise_dir, '*')))]
+    return _noise_clips
+
+
+def mix_noise(audio, rng, config, sr):
+    snr_db = rng.uniform(*config['snr_db'])
+    clips = load_noise(config['noise_dir'], sr) if config['noise_dir'] else None
+    if clips:
+        noise = clips[rng.integers(len(clips))]
+        noise = np.resize(noise, len(audio))
+        noise = np.roll(noise, rng.integers(len(noise)))
+    else:
+        noise = rng.standard_normal(len(audio)).astype(np.float32)
+    signal_power = np.mean(audio ** 2) + 1e-12
+    noise_power = np.mean(noise ** 2) + 1e-12
+    return audio + noise * np.sqrt(signal_power / (noise_power * 10 ** (snr_db / 10)))
+
+
+def augment_audio(audio, sr, rng, config):
+    shift = int(rng.uniform(-config['max_shift'], config['max_shift']) * len(audio))
+    audio = np.roll(audio, shift)
+    if rng.random() < config['pitch_prob']:
+        audio = librosa.effects.pitch_shift(audio, sr=sr, n_steps=rng.uniform(*config['pitch_steps']))
+    audio = mix_noise(audio, rng, config, sr)
+    audio = audio * 10 ** (rng.uniform(*config['gain_db']) / 20)
+    return audio.astype(np.float32)
+
+
+def build_shard(task):
+    """Decode each file once and write its original and augmented features to one shard."""
+    shard_path, items, variants, config = task
+    gate = ActivityGate(**config['gate']) if config['gate'] else None
+    x, y = [], []
+    for index, path, target in items:
+        audio, sr = librosa.load(path)
+        x.append(gated_mfcc_mean(audio, sr, gate))
+        y.append(target)
+        for variant in range(variants):
+            rng = np.random.default_rng([config['seed'], index, variant])
+            x.append(gated_mfcc_mean(augment_audio(audio, sr, rng, config), sr, gate))
+            y.append(target)
+    tmp_path = shard_path + '.tmp.npz'
+    np.savez(tmp_path, x=np.stack(x).astype(np.float32), y=np.array(y, dtype=np.int32))
+    os.replace(tmp_path, shard_path)
+    return shard_path
+
+
+def split_items(items, val_fraction, seed):
+    order = np.random.default_rng(seed).permutation(len(items))
+    n_val = int(len(items) * val_fraction)
+    val = set(order[:n_val].tolist())
+    indexed = [(i, path, target) for i, (path, target) in enumerate(items)]
+    return [item for item in indexed if item[0] not in val], [item for item in indexed if item[0] in val]
+
+
+def file_entry(path):
+    stat = os.stat(path)
+    return [path, stat.st_mtime, stat.st_size]
+
+
+def build_cache(directory, cache_dir, labels, workers=None, **overrides):
+    config = dict(DEFAULTS, **overrides)
+    items = list_dataset(directory, labels)
+    # Edited or replaced recordings (and noise clips) invalidate the cache, not just renamed ones
+    noise = sorted(glob.glob(os.path.join(config['noise_dir'], '*'))) if config['noise_dir'] else []
+    manifest = {'config': config, 'files': [file_entry(path) for path, _ in items],
+                'noise': [file_entry(path) for path in noise]}
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            if json.load(f) == json.loads(json.dumps(manifest)):
+                return manifest_path
+    os.makedirs(cache_dir, exist_ok=True)
+    # Drop the manifest first: an interrupted rebuild must not leave an old manifest next to partial shards
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    for stale in glob.glob(os.path.join(cache_dir, '*.npz')):
+        os.remove(stale)
+
+    train, val = split_items(items, config['val_fraction'], config['seed'])
+    tasks = []
+    for split, split_files, variants in (('train', train, config['variants']), ('val', val, 0)):
+        for start in range(0, len(split_files), config['shard_size']):
+            shard_path = os.path.join(cache_dir, f'{split}-{start // config["shard_size"]:05d}.npz')
+            tasks.append((shard_path, split_files[start:start + config['shard_size']], variants, config))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for shard_path in pool.map(build_shard, tasks):
+            print(f'Saved: {shard_path}')
+
+    # Written only once every shard exists, and atomically
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest_path
+
+
+def make_dataset(cache_dir, split='train', batch_size=32, shuffle_size=10000, seed=None):
+    """Prefetching tf.data pipeline over the cached shards of one split."""
+    import tensorflow as tf
+
+    def load_shard(path):
+        with np.load(path.decode(), allow_pickle=False) as data:
+            return data['x'], data['y']
+
+    def read(path):
+        x, y = tf.numpy_function(load_shard, [path], (tf.float32, tf.int32))
+        x.set_shape([None, N_MFCC])
+        y.set_shape([None])
+        return tf.data.Dataset.from_tensor_slices((tf.expand_dims(x, -1), y))
+
+    shards = sorted(glob.glob(os.path.join(cache_dir, f'{split}-*.npz')))
+    if not shards:
+        raise ValueError(f'No {split!r} shards in {cache_dir!r}; build the cache with augment.py '
+                         f'(a val split needs --val-fraction > 0 and enough files)')
+    dataset = tf.data.Dataset.from_tensor_slices(shards)
+    if split == 'train':
+        dataset = dataset.shuffle(len(shards), seed=seed)
+    # No .cache(): it would replay the first epoch's shard order; the shards are small decoded arrays
+    # and the shard shuffle above picks a new order every epoch
+    dataset = dataset.interleave(read, cycle_length=4, num_parallel_calls=tf.data.AUTOTUNE,
+                                 deterministic=split != 'train')
+    if split == 'train':
+        dataset = dataset.shuffle(shuffle_size, seed=seed)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a cached, augmented MFCC feature set')
+    parser.add_argument('directory')
+    parser.add_argument('cache_dir', nargs='?', default='augmented')
+    parser.add_argument('--labels', default='prediction.json')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--variants', type=int, default=DEFAULTS['variants'])
+    parser.add_argument('--seed', type=int, default=DEFAULTS['seed'])
+    parser.add_argument('--shard-size', type=int, default=DEFAULTS['shard_size'])
+    parser.add_argument('--val-fraction', type=float, default=DEFAULTS['val_fraction'])
+    parser.add_argument('--pitch-prob', type=float, default=DEFAULTS['pitch_prob'])
+    parser.add_argument('--noise-dir', default=None, help='background noise clips to mix in (default: white noise)')
+    parser.add_argument('--gate', choices=('energy', 'flux', 'off'), default='off',
+                        help="activity gate applied before MFCC (tuned by GATE_*); match the server's GATE_METHOD")
+    args = parser.parse_args()
+
+    with open(args.labels, 'r') as f:
+        labels = json.load(f)
+    manifest_path = build_cache(
+        args.directory, args.cache_dir, labels, args.workers,
+        variants=args.variants, seed=args.seed, shard_size=args.shard_size,
+        val_fraction=args.val_fraction, pitch_prob=args.pitch_prob, noise_dir=args.noise_dir,
+        gate=ActivityGate.env_config(args.gate) if args.gate != 'off' else None,
+    )
+    print(f'Cache ready: {manifest_path}')
+
+
+if __name__ == '__main__':
+    main()
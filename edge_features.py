@@ -0,0 +1,123 @@
+"""Reference edge extractor for the `/features` endpoint, using only NumPy.
+
+Reproduces `features.mfcc_mean` (librosa >= 0.10 `feature.mfcc` defaults:
+centered zero-padded 2048-point periodic Hann STFT with hop 512, 128 Slaney
+mel bands, power_to_db with an 80 dB floor, orthonormal DCT-II, first 40
+coefficients averaged over frames) so recorders without librosa send the same
+160-byte vector the server would compute from the audio. Input must already be
+mono at 22050 Hz, the rate `librosa.load` resamples to on the server. The
+upload path's activity gate is not applied; trim silence on the recorder if
+needed.
+
+    python edge_features.py clip.wav --format f32 > clip.f32
+    curl -X POST --data-binary @clip.f32 -H 'Content-Type: application/octet-stream' http://127.0.0.1:7860/features
+    python edge_features.py clip.wav --check     # compare against the server's librosa path
+"""
+import sys
+import json
+import wave
+import argparse
+
+import numpy as np
+
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 40
+TOP_DB = 80.0
+AMIN = 1e-10
+
+
+def hz_to_mel(freqs):
+    # Slaney scale: linear below 1 kHz, logarithmic above
+    freqs = np.asarray(freqs, dtype=np.float64)
+    mels = freqs / (200.0 / 3)
+    log_region = freqs >= 1000.0
+    return np.where(log_region, 15.0 + np.log(np.maximum(freqs, 1e-10) / 1000.0) / (np.log(6.4) / 27.0), mels)
+
+
+def mel_to_hz(mels):
+    mels = np.asarray(mels, dtype=np.float64)
+    freqs = (200.0 / 3) * mels
+    return np.where(mels >= 15.0, 1000.0 * np.exp((np.log(6.4) / 27.0) * (mels - 15.0)), freqs)
+
+
+def mel_filterbank(sr=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS):
+    fft_freqs = np.fft.rfftfreq(n_fft, d=1.0 / sr)
+    mel_f = mel_to_hz(np.linspace(hz_to_mel(0.0), hz_to_mel(sr / 2.0), n_mels + 2))
+    fdiff = np.diff(mel_f)
+    ramps = np.subtract.outer(mel_f, fft_freqs)
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_f[2:] - mel_f[:-2]))[:, None]
+    return weights.astype(np.float32)
+
+
+def dct_matrix(n_out=N_MFCC, n_in=N_MELS):
+    """Rows of the orthonormal DCT-II, so `dct_matrix() @ x` == scipy.fft.dct(x, norm='ortho')[:n_out]."""
+    k = np.arange(n_out)[:, None]
+    n = np.arange(n_in)[None, :]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_in)) * np.sqrt(2.0 / n_in)
+    basis[0] /= np.sqrt(2.0)
+    return basis
+
+
+MEL_BASIS = mel_filterbank()
+DCT = dct_matrix()
+WINDOW = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N_FFT) / N_FFT)).astype(np.float32)
+
+
+def power_spectrogram(audio):
+    padded = np.pad(audio, N_FFT // 2)
+    n_frames = 1 + (len(padded) - N_FFT) // HOP_LENGTH
+    frames = np.lib.stride_tricks.sliding_window_view(padded, N_FFT)[::HOP_LENGTH][:n_frames]
+    return np.abs(np.fft.rfft(frames * WINDOW, axis=1)) ** 2       # (frames, bins)
+
+
+def mfcc_mean(audio):
+    """The (40,) float32 feature vector for mono 22050 Hz audio."""
+    audio = np.asarray(audio, dtype=np.float32)
+    mel = power_spectrogram(audio) @ MEL_BASIS.T                    # (frames, mels)
+    log_mel = 10.0 * np.log10(np.maximum(AMIN, mel))
+    log_mel = np.maximum(log_mel, log_mel.max() - TOP_DB)
+    return (DCT @ log_mel.mean(axis=0)).astype(np.float32)
+
+
+def read_wav(path):
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise ValueError('Only 16-bit PCM WAV is supported')
+        sr, channels = f.getframerate(), f.getnchannels()
+        audio = np.frombuffer(f.readframes(f.getnframes()), dtype='<i2').astype(np.float32) / 32768.0
+    audio = audio.reshape(-1, channels).mean(axis=1)
+    if sr != SAMPLE_RATE:
+        raise ValueError(f'Expected {SAMPLE_RATE} Hz audio, got {sr} Hz; resample on the recorder first')
+    return audio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NumPy-only MFCC-mean extractor matching the server')
+    parser.add_argument('wav', nargs='+', help='mono or stereo 16-bit PCM WAV at 22050 Hz')
+    parser.add_argument('--format', choices=('json', 'f32'), default='json')
+    parser.add_argument('--check', action='store_true', help='compare with features.mfcc_mean (needs librosa)')
+    args = parser.parse_args()
+
+    vectors = np.stack([mfcc_mean(read_wav(path)) for path in args.wav])
+    if args.check:
+        import librosa
+        from features import mfcc_mean as server_mfcc_mean
+
+        for path, vector in zip(args.wav, vectors):
+            audio, sr = librosa.load(path)
+            diff = np.max(np.abs(vector - server_mfcc_mean(audio, sr)))
+            print(f'{path}: max abs diff {diff:.2e}')
+    elif args.format == 'f32':
+        sys.stdout.buffer.write(vectors.astype('<f4').tobytes())
+    else:
+        print(json.dumps({'features': np.round(vectors, 6).tolist()}))
+
+
+if __name__ == '__main__':
+    main()
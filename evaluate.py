@@ -0,0 +1,147 @@
+"""Score a model on a feature set and report per-class metrics for every class.
+
+    python evaluate.py model.h5 features.npz --output report.json --compare old_report.json
+
+The report is written as sorted, indented JSON (plus a per-class CSV) so two
+model versions can be compared with `--compare` or a plain text diff.
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from numpy_model import load_model
+
+
+def confusion_matrix(y_true, y_pred, n_classes):
+    counts = np.bincount(y_true * n_classes + y_pred, minlength=n_classes * n_classes)
+    return counts.reshape(n_classes, n_classes)
+
+
+def safe_divide(a, b):
+    return np.divide(a, b, out=np.zeros(np.shape(a), dtype=np.float64), where=b != 0)
+
+
+def per_class_metrics(cm):
+    tp = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    precision = safe_divide(tp, cm.sum(axis=0))
+    recall = safe_divide(tp, support)
+    f1 = safe_divide(2 * precision * recall, precision + recall)
+    return precision, recall, f1, support
+
+
+def top_k_accuracy(probs, y_true, k):
+    k = min(k, probs.shape[1])
+    top = np.argpartition(probs, -k, axis=1)[:, -k:]
+    return float(np.mean((top == y_true[:, None]).any(axis=1)))
+
+
+def evaluate(model, x, y_true, class_names, batch_size=4096):
+    started = time.perf_counter()
+    probs = model.predict(x.reshape(len(x), -1, 1), batch_size=batch_size, verbose=0)
+    elapsed = time.perf_counter() - started
+
+    if probs.shape[1] != len(class_names):
+        raise ValueError(f'Model outputs {probs.shape[1]} classes but the label map has {len(class_names)}')
+    if len(y_true) and y_true.max() >= len(class_names):
+        raise ValueError(f'Feature set has class index {int(y_true.max())} beyond the {len(class_names)}-class label map')
+    y_pred = probs.argmax(axis=1)
+    cm = confusion_matrix(y_true, y_pred, len(class_names))
+    precision, recall, f1, support = per_class_metrics(cm)
+    weights = safe_divide(support, support.sum())
+
+    def r(value):
+        return round(float(value), 6)
+
+    return {
+        'samples': int(len(x)),
+        'seconds': round(elapsed, 4),
+        'throughput': round(len(x) / elapsed, 1) if elapsed else None,
+        'accuracy': r(np.mean(y_pred == y_true)),
+        'top5_accuracy': r(top_k_accuracy(probs, y_true, 5)),
+        'macro': {'precision': r(precision.mean()), 'recall': r(recall.mean()), 'f1': r(f1.mean())},
+        'weighted': {'precision': r(precision @ weights), 'recall': r(recall @ weights), 'f1': r(f1 @ weights)},
+        'classes': {
+            name: {'precision': r(precision[i]), 'recall': r(recall[i]), 'f1': r(f1[i]), 'support': int(support[i])}
+            for i, name in enumerate(class_names)
+        },
+        'confusion_matrix': cm.tolist(),
+    }
+
+
+def class_names_from_labels(labels):
+    """Names by class index; indices missing from the map get a placeholder name."""
+    n_classes = max((int(index) for index in labels), default=-1) + 1
+    return [labels.get(str(i), f'<class {i}>') for i in range(n_classes)]
+
+
+def compare(report, baseline, top=10):
+    lines = []
+    for key in ('accuracy', 'top5_accuracy'):
+        lines.append(f'{key:<18} {baseline[key]:.4f} -> {report[key]:.4f} ({report[key] - baseline[key]:+.4f})')
+    for avg in ('macro', 'weighted'):
+        old, new = baseline[avg]['f1'], report[avg]['f1']
+        lines.append(f'{avg + " f1":<18} {old:.4f} -> {new:.4f} ({new - old:+.4f})')
+    deltas = sorted(
+        ((report['classes'][name]['f1'] - old['f1'], name) for name, old in baseline['classes'].items()
+         if name in report['classes']),
+        key=lambda item: abs(item[0]), reverse=True,
+    )
+    lines.append('Largest per-class F1 changes:')
+    lines.extend(f'  {delta:+.4f}  {name}' for delta, name in deltas[:top] if delta)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized evaluation with per-class metrics')
+    parser.add_argument('model', help='model.h5 or model.npz')
+    parser.add_argument('features', help='feature set from features.py')
+    parser.add_argument('--labels', default='prediction.json')
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('--output', default='evaluation.json')
+    parser.add_argument('--compare', help='earlier report to print deltas against')
+    parser.add_argument('--gate', choices=('energy', 'flux', 'off'), default=os.environ.get('GATE_METHOD', 'off'),
+                        help='activity gate the model is served with (default: $GATE_METHOD)')
+    args = parser.parse_args()
+    # Imported here so the metric functions above need only NumPy
+    from features import load_feature_set, feature_set_gate
+
+    with open(args.labels, 'r') as f:
+        labels = json.load(f)
+    class_names = class_names_from_labels(labels)
+    x, y = load_feature_set(args.features)
+
+    try:
+        report = evaluate(load_model(args.model), x, y, class_names, args.batch_size)
+    except ValueError as e:
+        raise SystemExit(f'{args.model}: {e}')
+    report['model'] = args.model
+    report['features'] = args.features
+    report['gate'] = feature_set_gate(args.features)
+    if report['gate'] != args.gate:
+        print(f'Warning: features were built with gate {report["gate"]!r} but the model is served with '
+              f'{args.gate!r}; rebuild them with `features.py --gate {args.gate}` to score what is served')
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    csv_path = args.output.rsplit('.', 1)[0] + '.csv'
+    with open(csv_path, 'w') as f:
+        f.write('class,precision,recall,f1,support\n')
+        for name, m in report['classes'].items():
+            f.write(f'"{name}",{m["precision"]},{m["recall"]},{m["f1"]},{m["support"]}\n')
+
+    print(f'Accuracy: {report["accuracy"]:.4f}  Top-5: {report["top5_accuracy"]:.4f}  '
+          f'Macro F1: {report["macro"]["f1"]:.4f}  Weighted F1: {report["weighted"]["f1"]:.4f}')
+    print(f'{report["samples"]} samples in {report["seconds"]:.3f}s ({report["throughput"]} samples/s)')
+    print(f'Saved: {args.output}, {csv_path}')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print(compare(report, json.load(f)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Export the Keras Conv1D classifier to a flat `.npz` for `numpy_model.NumpyModel`.
+
+In this architecture BatchNormalization follows the ReLU of each Conv1D, so it
+is folded forward into the next Conv1D/Dense kernel (through MaxPool/Flatten,
+which commute with a positive per-channel scale). Any BatchNorm that cannot be
+folded is kept as an explicit per-channel affine op.
+
+    python export_npz.py model.h5 model.npz --check
+"""
+import argparse
+
+import numpy as np
+
+
+def batchnorm_affine(layer):
+    gamma, beta, mean, var = [w.astype(np.float64) for w in layer.get_weights()]
+    scale = gamma / np.sqrt(var + layer.epsilon)
+    return scale, beta - mean * scale
+
+
+def fold_into_kernel(w, b, scale, shift):
+    # w: (K, Cin, Cout) for Conv1D or (In, Out) for Dense; scale/shift over Cin/In
+    w = w.astype(np.float64)
+    in_axis = w.ndim - 2
+    b = b.astype(np.float64) + np.tensordot(w, shift, axes=([in_axis], [0])).sum(axis=tuple(range(w.ndim - 2)))
+    w = w * np.expand_dims(scale, -1)
+    return w, b
+
+
+def convert(model):
+    ops, acts, pools, params = [], [], [], {}
+    pending = None      # (scale, shift) of a BatchNorm not yet folded
+    channels = None     # channel count of the tensor the pending affine applies to
+
+    def emit(op, act='linear', pool=0, w=None, b=None):
+        i = len(ops)
+        ops.append(op)
+        acts.append(act)
+        pools.append(pool)
+        if w is not None:
+            params[f'w{i}'] = np.asarray(w, dtype=np.float32)
+            params[f'b{i}'] = np.asarray(b, dtype=np.float32)
+
+    def flush():
+        nonlocal pending
+        if pending is not None:
+            emit('affine', w=pending[0], b=pending[1])
+            pending = None
+
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+        if kind == 'BatchNormalization':
+            flush()
+            pending = batchnorm_affine(layer)
+            channels = len(pending[0])
+        elif kind in ('Conv1D', 'Dense'):
+            config = layer.get_config()
+            if kind == 'Conv1D' and (config['padding'] != 'valid' or tuple(config['strides']) != (1,)
+                                     or tuple(config['dilation_rate']) != (1,)):
+                raise ValueError(f'Unsupported Conv1D config in layer {layer.name}')
+            w, b = layer.get_weights() if config['use_bias'] else (layer.get_weights()[0], None)
+            if b is None:
+                b = np.zeros(w.shape[-1], dtype=w.dtype)
+            if pending is not None:
+                w, b = fold_into_kernel(w, b, *pending)
+                pending = None
+            emit(kind.lower(), config['activation'], w=w, b=b)
+        elif kind in ('MaxPooling1D', 'MaxPool1D'):
+            config = layer.get_config()
+            pool = np.ravel(config['pool_size'])[0]
+            strides = np.ravel(config['strides'] or pool)[0]
+            if config['padding'] != 'same' or strides != pool:
+                raise ValueError(f'Unsupported MaxPool1D config in layer {layer.name}')
+            if pending is not None and np.any(pending[0] <= 0):
+                flush()
+            emit('maxpool1d', pool=int(pool))
+        elif kind == 'Flatten':
+            if pending is not None:
+                # channels-last flatten: (L, C) -> L * C, so the affine repeats every C entries
+                length = int(np.prod(layer.input.shape[1:])) // channels
+                pending = (np.tile(pending[0], length), np.tile(pending[1], length))
+            emit('flatten')
+        else:
+            raise ValueError(f'Unsupported layer type: {kind}')
+    flush()
+
+    return dict(
+        params,
+        ops=np.array(ops),
+        acts=np.array(acts),
+        pool=np.array(pools, dtype=np.int32),
+        input_shape=np.array(model.input_shape[1:], dtype=np.int32),
+    )
+
+
+def check(model, npz_path, samples=256, seed=0):
+    from numpy_model import NumpyModel
+
+    x = np.random.default_rng(seed).normal(0, 50, (samples,) + model.input_shape[1:]).astype(np.float32)
+    expected = model.predict(x, verbose=0)
+    actual = NumpyModel(npz_path).predict(x)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    agreement = float(np.mean(expected.argmax(1) == actual.argmax(1)))
+    return max_diff, agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('model', nargs='?', default='model.h5')
+    parser.add_argument('output', nargs='?', default='model.npz')
+    parser.add_argument('--check', action='store_true', help='compare against Keras on random inputs')
+    parser.add_argument('--atol', type=float, default=1e-4)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(args.model)
+    np.savez(args.output, **convert(model))
+    print(f'Saved: {args.output}')
+
+    if args.check:
+        max_diff, agreement = check(model, args.output)
+        print(f'Max abs diff: {max_diff:.2e}  Top-1 agreement: {agreement:.2%}')
+        if max_diff > args.atol:
+            raise SystemExit(f'Outputs differ by more than {args.atol}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""MFCC feature extraction shared by the app, evaluation and training tools.
+
+Builds a feature set from a directory of class folders (the Kaggle "Voice of
+Birds" layout) into a `.npz` with `x` (N, 40) float32 MFCC means, `y` (N,)
+class indices from `prediction.json` and the source `paths`. `--gate` applies
+the server's activity gate (the method given, tuned by the same `GATE_*`
+variables), so a model served with gating is trained and evaluated on gated
+clips too:
+
+    python features.py "Voice of Birds" features.npz --workers 8 --gate energy
+"""
+import os
+import json
+import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import librosa
+
+from activity import ActivityGate
+
+N_MFCC = 40
+
+
+def mfcc_mean(audio, sr):
+    """The (40,) MFCC mean of `audio`; callers apply any activity gate beforehand."""
+    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=N_MFCC)
+    return np.mean(mfcc, axis=1).astype(np.float32)
+
+
+def gated_mfcc_mean(audio, sr, gate=None):
+    """`mfcc_mean` of the audio an `ActivityGate` keeps; labelled clips with no activity are kept whole."""
+    if gate is not None:
+        active, _ = gate(audio, sr)
+        audio = active if len(active) else audio
+    return mfcc_mean(audio, sr)
+
+
+def audio_to_features(audio_file, gate=None):
+    # `gate` is a dict of ActivityGate arguments (see ActivityGate.env_config) so it pickles to workers
+    audio, sr = librosa.load(audio_file)
+    return gated_mfcc_mean(audio, sr, ActivityGate(**gate) if gate else None)
+
+
+def list_dataset(directory, labels):
+    """(path, class index) for every file under `directory/<class name>/`."""
+    class_index = {name: int(index) for index, name in labels.items()}
+    items = []
+    for target_class in sorted(os.listdir(directory)):
+        target_class_path = os.path.join(directory, target_class)
+        if not os.path.isdir(target_class_path) or target_class not in class_index:
+            continue
+        for audio_file in sorted(os.listdir(target_class_path)):
+            items.append((os.path.join(target_class_path, audio_file), class_index[target_class]))
+    return items
+
+
+def build_feature_set(directory, labels, workers=None, chunksize=8, gate=None):
+    items = list_dataset(directory, labels)
+    paths = [path for path, _ in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        x = list(pool.map(functools.partial(audio_to_features, gate=gate), paths, chunksize=chunksize))
+    x = np.stack(x) if x else np.empty((0, N_MFCC), dtype=np.float32)
+    y = np.array([target for _, target in items], dtype=np.int32)
+    return x, y, np.array(paths)
+
+
+def load_feature_set(path):
+    with np.load(path, allow_pickle=False) as data:
+        return data['x'].astype(np.float32), data['y'].astype(np.int64)
+
+
+def feature_set_gate(path):
+    """The activity gate a feature set was built with ('off' for sets that predate `--gate`)."""
+    with np.load(path, allow_pickle=False) as data:
+        return str(data['gate']) if 'gate' in data.files else 'off'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract MFCC-mean features from class folders of audio')
+    parser.add_argument('directory')
+    parser.add_argument('output', nargs='?', default='features.npz')
+    parser.add_argument('--labels', default='prediction.json')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--gate', choices=('energy', 'flux', 'off'), default='off',
+                        help="activity gate applied before MFCC (tuned by GATE_*); match the server's GATE_METHOD")
+    args = parser.parse_args()
+
+    with open(args.labels, 'r') as f:
+        labels = json.load(f)
+    gate = ActivityGate.env_config(args.gate) if args.gate != 'off' else None
+    x, y, paths = build_feature_set(args.directory, labels, args.workers, gate=gate)
+    np.savez(args.output, x=x, y=y, paths=paths, gate=args.gate, gate_config=json.dumps(gate))
+    print(f'Saved: {args.output} ({len(x)} files, {len(np.unique(y))} classes, gate {args.gate})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    filename TEXT,
+    species TEXT,
+    confidence REAL,
+    top_k TEXT,
+    model_version TEXT,
+    duration REAL,
+    active_seconds REAL,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions (created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_species ON predictions (species, created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_content_hash ON predictions (content_hash);
+"""
+
+COLUMNS = ('created_at', 'content_hash', 'filename', 'species', 'confidence', 'top_k',
+           'model_version', 'duration', 'active_seconds', 'latency_ms')
+MAX_PAGE_SIZE = 1000
+
+
+class HistoryStore:
+    """Classification history in SQLite (WAL mode), written by a background thread.
+
+    `record()` only enqueues, so requests never wait on disk; the writer drains
+    the queue and inserts up to `batch_size` rows per transaction. If the queue
+    is full the record is dropped and counted rather than blocking the request.
+    """
+
+    def __init__(self, path='history.db', batch_size=256, flush_interval=1.0, max_queue=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        with closing(self.connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        self._thread = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._thread.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def record(self, content_hash, result, filename=None):
+        row = (
+            time.time(), content_hash, filename, result.get('class'), result.get('confidence'),
+            json.dumps(result.get('top_k', [])), result.get('model_version'),
+            result['activity']['duration'], result['activity']['active_seconds'], result.get('latency_ms'),
+        )
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        conn = self.connect()
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            if rows:
+                try:
+                    with conn:
+                        conn.executemany(
+                            f'INSERT INTO predictions ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})',
+                            rows)
+                    self.written += len(rows)
+                except sqlite3.Error:
+                    logger.exception('Failed to write %d history records', len(rows))
+            for _ in batch:
+                self.queue.task_done()
+            if None in batch:
+                conn.close()
+                return
+
+    def close(self, timeout=5.0):
+        """Flush pending records and stop the writer."""
+        if self._thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def query(self, limit=50, before_id=None, species=None, since=None, until=None):
+        """Newest-first page of records; pass the last `id` as `before_id` for the next page."""
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+        where, params = time_filter(since, until)
+        if species:
+            where.append('species = ?')
+            params.append(species)
+        if before_id:
+            where.append('id < ?')
+            params.append(before_id)
+        sql = 'SELECT * FROM predictions'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        with closing(self.connect()) as conn:
+            rows = [dict(row) for row in conn.execute(sql, params)]
+        for row in rows:
+            row['top_k'] = json.loads(row['top_k'] or '[]')
+        return {'items': rows, 'next_before_id': rows[-1]['id'] if rows and len(rows) == limit else None}
+
+    def summary(self, since=None, until=None, bucket=None):
+        """Detections per species (and per UTC day/hour `bucket`) between `since` and `until`."""
+        where, params = time_filter(since, until)
+        clause = (' WHERE ' + ' AND '.join(where)) if where else ''
+        with closing(self.connect()) as conn:
+            totals = conn.execute(
+                f'SELECT COUNT(*) AS total, SUM(species IS NULL) AS no_bird, AVG(latency_ms) AS mean_latency_ms '
+                f'FROM predictions{clause}', params).fetchone()
+            species = conn.execute(
+                f'SELECT species, COUNT(*) AS count, AVG(confidence) AS mean_confidence, MAX(created_at) AS last_seen '
+                f'FROM predictions{clause}{" AND" if where else " WHERE"} species IS NOT NULL '
+                f'GROUP BY species ORDER BY count DESC', params).fetchall()
+            result = {**dict(totals), 'species': [dict(row) for row in species]}
+            if bucket in ('day', 'hour'):
+                fmt = '%Y-%m-%d' if bucket == 'day' else '%Y-%m-%dT%H:00'
+                rows = conn.execute(
+                    f"SELECT strftime('{fmt}', created_at, 'unixepoch') AS bucket, species, COUNT(*) AS count "
+                    f'FROM predictions{clause} GROUP BY bucket, species ORDER BY bucket', params).fetchall()
+                result['buckets'] = [dict(row) for row in rows]
+        return result
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'written': self.written, 'dropped': self.dropped}
+
+
+def time_filter(since, until):
+    where, params = [], []
+    if since is not None:
+        where.append('created_at >= ?')
+        params.append(parse_time(since))
+    if until is not None:
+        where.append('created_at < ?')
+        params.append(parse_time(until))
+    return where, params
+
+
+def parse_time(value):
+    """Epoch seconds or an ISO date/datetime; without an offset it is UTC, like the summary buckets."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
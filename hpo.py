@@ -0,0 +1,276 @@
+"""Hyperparameter search over the Conv1D architecture on CPU.
+
+Trials sample the notebook's architecture knobs (conv blocks and filters, dense
+layers and units, dropout, L2, learning rate) and train in a process pool on a
+precomputed feature set (`features.py`), each worker with its own share of the
+cores. Bad trials are stopped early with successive halving: every rung trains
+the survivors up to `min_epochs * eta**rung` epochs, resuming from their
+checkpoints, and keeps the best `1/eta`. Trials are scored on validation
+accuracy and on single-sample CPU latency through the NumPy runtime that
+serves `model.npz`. Latency is measured once the rung's training has finished,
+one trial at a time in a separate process pinned to one core, so the numbers
+are not inflated by contention with training. Promotion ranks by Pareto front
+first so small, fast models are not eliminated just for being less accurate.
+The accuracy-versus-latency front is taken over the trials that completed the
+final rung (so every point had the full epoch budget) and saved; those trials
+export as `model.h5`, and earlier-stopped ones only with `--allow-partial`:
+
+    python hpo.py search features.npz --trials 27 --workers 4
+    python hpo.py export hpo/results.json 7 model.h5
+"""
+import os
+import json
+import time
+import math
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import resources
+from features import load_feature_set
+
+SEARCH_SPACE = {
+    'conv_blocks': [1, 2, 3],
+    'filters': [32, 64, 128, 256],
+    'dense_layers': [1, 2],
+    'units': [64, 128, 256, 512],
+    'dropout': (0.1, 0.5),
+    'l2': (1e-4, 1e-2),              # log-uniform
+    'learning_rate': (1e-4, 3e-3),   # log-uniform
+}
+
+_data = None
+
+
+def sample_params(rng):
+    filters = sorted(rng.choice(SEARCH_SPACE['filters'], size=rng.choice(SEARCH_SPACE['conv_blocks'])).tolist())
+    return {
+        'filters': [int(f) for f in filters],
+        'units': [int(rng.choice(SEARCH_SPACE['units']))] * int(rng.choice(SEARCH_SPACE['dense_layers'])),
+        'dropout': round(float(rng.uniform(*SEARCH_SPACE['dropout'])), 3),
+        'l2': float(np.exp(rng.uniform(*np.log(SEARCH_SPACE['l2'])))),
+        'learning_rate': float(np.exp(rng.uniform(*np.log(SEARCH_SPACE['learning_rate'])))),
+    }
+
+
+def build_model(params, input_shape, n_classes):
+    from tensorflow import keras
+
+    layers = [keras.layers.Input(shape=input_shape)]
+    for filters in params['filters']:
+        layers += [
+            keras.layers.Conv1D(filters=filters, kernel_size=3, activation='relu'),
+            keras.layers.BatchNormalization(),
+            keras.layers.MaxPool1D(pool_size=2, padding='same'),
+        ]
+    layers.append(keras.layers.Flatten())
+    for units in params['units']:
+        layers += [
+            keras.layers.Dense(units=units, activation='relu', kernel_regularizer=keras.regularizers.L2(l2=params['l2'])),
+            keras.layers.Dropout(rate=params['dropout']),
+        ]
+    layers.append(keras.layers.Dense(units=n_classes, activation='softmax'))
+    model = keras.Sequential(layers)
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=params['learning_rate']),
+                  loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def init_worker(threads, affinity=None):
+    resources.configure(threads=threads, affinity=affinity)
+
+
+def load_split(features_path, val_fraction, seed):
+    global _data
+    if _data is None:
+        x, y = load_feature_set(features_path)
+        order = np.random.default_rng(seed).permutation(len(x))
+        n_val = int(len(x) * val_fraction)
+        val, train = order[:n_val], order[n_val:]
+        _data = (x[train, :, None], y[train], x[val, :, None], y[val])
+    return _data
+
+
+def measure_latency(checkpoint, repeats=200):
+    """Median single-sample latency (ms) of a trial checkpoint, exported to the NumPy runtime."""
+    from tensorflow import keras
+    from export_npz import convert
+    from numpy_model import NumpyModel
+
+    model = keras.models.load_model(checkpoint)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.npz')
+        np.savez(path, **convert(model))
+        runtime = NumpyModel(path)
+    x = np.zeros((1,) + runtime.input_shape, dtype=np.float32)
+    for _ in range(20):
+        runtime.predict(x)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        runtime.predict(x)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
+
+
+def run_trial(task):
+    """Train one trial up to `task['epochs']`, resuming from its checkpoint, and score it."""
+    import tensorflow as tf
+
+    x_train, y_train, x_val, y_val = load_split(task['features'], task['val_fraction'], task['seed'])
+    tf.keras.utils.set_random_seed(task['seed'] + task['trial'])
+    checkpoint = task['checkpoint']
+    if os.path.exists(checkpoint):
+        model = tf.keras.models.load_model(checkpoint)
+    else:
+        model = build_model(task['params'], x_train.shape[1:], task['n_classes'])
+    model.fit(x_train, y_train, batch_size=task['batch_size'], initial_epoch=task['done'],
+              epochs=task['epochs'], verbose=0)
+    _, val_accuracy = model.evaluate(x_val, y_val, batch_size=1024, verbose=0)
+    model.save(checkpoint)
+    return {
+        'trial': task['trial'],
+        'epochs': task['epochs'],
+        'val_accuracy': round(float(val_accuracy), 4),
+        'n_params': int(model.count_params()),
+    }
+
+
+def pareto_ranks(trials):
+    """Non-dominated sorting on (max accuracy, min latency); rank 0 is the front."""
+    ranks = {}
+    remaining = list(trials)
+    rank = 0
+    while remaining:
+        front = [t for t in remaining if not any(
+            o['val_accuracy'] >= t['val_accuracy'] and o['latency_ms'] <= t['latency_ms']
+            and (o['val_accuracy'] > t['val_accuracy'] or o['latency_ms'] < t['latency_ms'])
+            for o in remaining)]
+        for t in front:
+            ranks[t['trial']] = rank
+        remaining = [t for t in remaining if t['trial'] not in ranks]
+        rank += 1
+    return ranks
+
+
+def search(features, workdir, n_trials=27, eta=3, min_epochs=20, workers=None, batch_size=32,
+           val_fraction=0.15, seed=0, labels='prediction.json'):
+    os.makedirs(workdir, exist_ok=True)
+    _, y = load_feature_set(features)
+    # The output layer must cover every served class, including any absent from this feature set
+    with open(labels, 'r') as f:
+        n_classes = len(json.load(f))
+    if len(y) and y.max() >= n_classes:
+        raise ValueError(f'{features} has class index {int(y.max())} but {labels} lists only {n_classes} classes')
+    workers = workers or max(1, len(resources.available_cpus()) // 2)
+    threads = max(1, len(resources.available_cpus()) // workers)
+
+    rng = np.random.default_rng(seed)
+    trials = {i: {'trial': i, 'params': sample_params(rng), 'history': [], 'epochs': 0, 'latency_ms': None,
+                  'checkpoint': os.path.join(workdir, f'trial-{i}.h5')} for i in range(n_trials)}
+    survivors = list(trials)
+    n_rungs = max(1, int(math.log(n_trials, eta) + 1e-9) + 1)
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                             initargs=(threads,)) as pool, \
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=init_worker,
+                                initargs=(1, 'auto')) as timer:
+        for rung in range(n_rungs):
+            epochs = min_epochs * eta ** rung
+            tasks = [{
+                'trial': i, 'params': trials[i]['params'], 'checkpoint': trials[i]['checkpoint'],
+                'done': trials[i]['epochs'], 'epochs': epochs,
+                'features': features, 'val_fraction': val_fraction, 'seed': seed,
+                'n_classes': n_classes, 'batch_size': batch_size,
+            } for i in survivors]
+            for result in pool.map(run_trial, tasks):
+                trial = trials[result['trial']]
+                trial.update(epochs=result['epochs'], val_accuracy=result['val_accuracy'],
+                             n_params=result['n_params'], rung=rung)
+                trial['history'].append({'epochs': result['epochs'], 'val_accuracy': result['val_accuracy']})
+
+            # Latency depends only on the architecture; time new trials one by one while training is idle
+            unmeasured = [i for i in survivors if trials[i]['latency_ms'] is None]
+            checkpoints = [trials[i]['checkpoint'] for i in unmeasured]
+            for i, latency in zip(unmeasured, timer.map(measure_latency, checkpoints)):
+                trials[i]['latency_ms'] = round(latency, 4)
+            for i in survivors:
+                trial = trials[i]
+                print(f'rung {rung} trial {trial["trial"]:>3}  epochs {trial["epochs"]:>4}  '
+                      f'val_acc {trial["val_accuracy"]:.4f}  latency {trial["latency_ms"]:.3f} ms')
+
+            if rung == n_rungs - 1:
+                break
+            scored = [trials[i] for i in survivors]
+            ranks = pareto_ranks(scored)
+            scored.sort(key=lambda t: (ranks[t['trial']], -t['val_accuracy']))
+            survivors = [t['trial'] for t in scored[:max(1, len(scored) // eta)]]
+
+    # Only trials that finished the last rung had the full budget; earlier-stopped ones are not comparable
+    final_rung = n_rungs - 1
+    finalists = [t for t in trials.values() if t.get('rung') == final_rung]
+    ranks = pareto_ranks(finalists)
+    front = sorted((t for t in finalists if ranks[t['trial']] == 0), key=lambda t: t['latency_ms'])
+    results = {
+        'features': features, 'eta': eta, 'min_epochs': min_epochs, 'seed': seed,
+        'final_rung': final_rung, 'final_epochs': min_epochs * eta ** final_rung,
+        'trials': sorted(trials.values(), key=lambda t: t['trial']),
+        'pareto_front': [t['trial'] for t in front],
+    }
+    results_path = os.path.join(workdir, 'results.json')
+    with open(results_path, 'w') as f:
+        json.dump(results, f, indent=1)
+    return results_path, front
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel successive-halving search over the Conv1D architecture')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('search')
+    run.add_argument('features', help='feature set from features.py')
+    run.add_argument('--workdir', default='hpo')
+    run.add_argument('--trials', type=int, default=27)
+    run.add_argument('--eta', type=int, default=3)
+    run.add_argument('--min-epochs', type=int, default=20)
+    run.add_argument('--workers', type=int, default=None)
+    run.add_argument('--batch-size', type=int, default=32)
+    run.add_argument('--val-fraction', type=float, default=0.15)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--labels', default='prediction.json', help='class map that sets the output layer size')
+    export = sub.add_parser('export', help='copy a trial checkpoint out as model.h5')
+    export.add_argument('results')
+    export.add_argument('trial', type=int)
+    export.add_argument('output', nargs='?', default='model.h5')
+    export.add_argument('--allow-partial', action='store_true',
+                        help='export a trial that was stopped before the final rung')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        with open(args.results, 'r') as f:
+            results = json.load(f)
+        trials = {t['trial']: t for t in results['trials']}
+        trial = trials[args.trial]
+        if trial.get('rung') != results['final_rung'] and not args.allow_partial:
+            raise SystemExit(f'Trial {args.trial} stopped after {trial["epochs"]} of {results["final_epochs"]} epochs; '
+                             f'retrain it or pass --allow-partial to export it anyway')
+        shutil.copyfile(trials[args.trial]['checkpoint'], args.output)
+        print(f'Saved: {args.output} (trial {args.trial}, {trials[args.trial]["params"]})')
+        return
+
+    results_path, front = search(args.features, args.workdir, args.trials, args.eta, args.min_epochs,
+                                 args.workers, args.batch_size, args.val_fraction, args.seed, args.labels)
+    print('Pareto front of final-rung trials (accuracy vs. latency):')
+    for t in front:
+        print(f'  trial {t["trial"]:>3}  val_acc {t["val_accuracy"]:.4f}  latency {t["latency_ms"]:.3f} ms  '
+              f'params {t["n_params"]:>8}  epochs {t["epochs"]:>4}  {t["params"]}')
+    print(f'Saved: {results_path}')
+
+
+if __name__ == '__main__':
+    main()
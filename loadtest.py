@@ -0,0 +1,336 @@
+"""Load generator for the upload endpoint.
+
+Replays a corpus of audio files against the app as multipart uploads with the
+JSON response (`Accept: application/json`), either closed-loop (`--concurrency`
+clients sending back to back) or open-loop (Poisson arrivals at `--rate`
+requests/s, capped at `--concurrency` in flight plus `--max-backlog` queued;
+arrivals beyond that, and requests still queued at the deadline, are reported
+as `dropped`). Reports throughput,
+p50/p95/p99 latency, error rate and, when the server PID is known, server RSS
+over time.
+
+    python loadtest.py --url http://127.0.0.1:7860/ --corpus samples/ --concurrency 8 --duration 60
+    python loadtest.py --stub --concurrency 8 --rate 20 --output results/stub.json --compare results/last.json
+
+`--stub` starts `app.py` itself on a free port with a randomly initialised
+`model.npz` of the same architecture, so it runs without `model.h5` (and
+without TensorFlow), synthesising a corpus when `--corpus` is not given.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import uuid
+import socket
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac')
+
+
+def stub_model(path, n_classes, seed=0):
+    """Random weights in the `export_npz.py` layout of the notebook architecture."""
+    rng = np.random.default_rng(seed)
+    ops = ['conv1d', 'maxpool1d', 'conv1d', 'maxpool1d', 'conv1d', 'maxpool1d', 'flatten', 'dense', 'dense', 'dense']
+    acts = ['relu', 'linear', 'relu', 'linear', 'relu', 'linear', 'linear', 'relu', 'relu', 'softmax']
+    shapes = {0: (3, 1, 128), 2: (3, 128, 256), 4: (3, 256, 256), 7: (1024, 512), 8: (512, 512), 9: (512, n_classes)}
+    params = {}
+    for i, shape in shapes.items():
+        fan_in = int(np.prod(shape[:-1]))
+        params[f'w{i}'] = (rng.standard_normal(shape) / np.sqrt(fan_in) / 10).astype(np.float32)
+        params[f'b{i}'] = np.zeros(shape[-1], dtype=np.float32)
+    np.savez(path, ops=np.array(ops), acts=np.array(acts), input_shape=np.array([40, 1], dtype=np.int32),
+             pool=np.array([2 if op == 'maxpool1d' else 0 for op in ops], dtype=np.int32), **params)
+
+
+def synth_corpus(directory, count=8, seconds=5.0, sr=22050, seed=0):
+    """Chirp bursts over low noise, plus a silent clip to exercise the activity gate."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    t = np.arange(int(seconds * sr)) / sr
+    for i in range(count):
+        audio = rng.normal(0, 0.005, len(t))
+        if i < count - 1:
+            for start in rng.uniform(0, seconds - 0.5, 4):
+                mask = (t >= start) & (t < start + 0.3)
+                f0, f1 = rng.uniform(2000, 6000, 2)
+                phase = 2 * np.pi * (f0 * (t[mask] - start) + (f1 - f0) / 0.6 * (t[mask] - start) ** 2)
+                audio[mask] += 0.3 * np.sin(phase)
+        with wave.open(os.path.join(directory, f'synthetic{i}.wav'), 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(sr)
+            f.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+
+
+def load_corpus(directory):
+    files = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(AUDIO_EXTENSIONS):
+            with open(os.path.join(directory, name), 'rb') as f:
+                files.append((name, f.read()))
+    if not files:
+        raise SystemExit(f'No audio files in {directory}')
+    return files
+
+
+def multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def send(url, payload, timeout, scheduled=None):
+    # Open-loop latency counts from the scheduled arrival, so time queued behind busy clients is included
+    body, content_type = payload
+    req = urllib.request.Request(url, data=body, method='POST', headers={
+        'Content-Type': content_type, 'Accept': 'application/json', 'X-Requested-With': 'XMLHttpRequest'})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    started = scheduled or started
+    return started, time.perf_counter() - started, status
+
+
+def read_rss(pid):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        started = time.perf_counter()
+        while not self.stopped.is_set():
+            rss = read_rss(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.perf_counter() - started, 2), rss))
+            self.stopped.wait(self.interval)
+
+
+def run_load(url, payloads, concurrency, duration, rate=None, timeout=60.0, seed=0, max_backlog=None):
+    """Return (results, dropped); only open-loop runs drop requests."""
+    results = []
+    dropped = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    rng = random.Random(seed)
+
+    def record(result):
+        with lock:
+            results.append(result)
+
+    if rate:
+        # Open loop: arrivals do not wait on responses. The queue behind the busy clients is bounded, and
+        # whatever is still queued at the deadline is cancelled, so an overloaded run still ends on time
+        limit = concurrency + (concurrency if max_backlog is None else max_backlog)
+        pending = 0
+
+        def done(future):
+            nonlocal pending, dropped
+            with lock:
+                pending -= 1
+                if future.cancelled():
+                    dropped += 1
+                else:
+                    results.append(future.result())
+
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            next_at = time.perf_counter()
+            while next_at < deadline:
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+                with lock:
+                    accepted = pending < limit
+                    pending += accepted
+                    dropped += not accepted
+                if accepted:
+                    pool.submit(send, url, rng.choice(payloads), timeout, next_at).add_done_callback(done)
+                next_at += rng.expovariate(rate)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    else:
+        def client(worker):
+            client_rng = random.Random(seed + worker)
+            while time.perf_counter() < deadline:
+                record(send(url, client_rng.choice(payloads), timeout))
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results, dropped
+
+
+def summarize(results, started, rss_samples, dropped=0):
+    latencies = np.array([latency for _, latency, status in results if status == 200])
+    statuses = {}
+    for _, _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    elapsed = max((t + latency for t, latency, _ in results), default=started) - started
+    ok = len(latencies)
+    summary = {
+        'requests': len(results),
+        'ok': ok,
+        'dropped': dropped,
+        'error_rate': round(1 - ok / len(results), 4) if results else 0.0,
+        'statuses': statuses,
+        'seconds': round(elapsed, 3),
+        'throughput': round(ok / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    if ok:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary.update(latency_ms={
+            'mean': round(latencies.mean() * 1000, 1), 'p50': round(p50 * 1000, 1),
+            'p95': round(p95 * 1000, 1), 'p99': round(p99 * 1000, 1), 'max': round(latencies.max() * 1000, 1)})
+    if rss_samples:
+        rss = [value for _, value in rss_samples]
+        summary['rss_mb'] = {'start': round(rss[0] / 2 ** 20, 1), 'end': round(rss[-1] / 2 ** 20, 1),
+                             'max': round(max(rss) / 2 ** 20, 1)}
+    return summary
+
+
+def compare(summary, baseline):
+    lines = []
+    for key in ('throughput', 'error_rate', 'dropped'):
+        lines.append(f'{key:<12} {baseline.get(key)} -> {summary.get(key)}')
+    for key in ('p50', 'p95', 'p99'):
+        old, new = baseline.get('latency_ms', {}).get(key), summary.get('latency_ms', {}).get(key)
+        lines.append(f'{key + " ms":<12} {old} -> {new}')
+    if 'rss_mb' in summary and 'rss_mb' in baseline:
+        lines.append(f'{"max rss mb":<12} {baseline["rss_mb"]["max"]} -> {summary["rss_mb"]["max"]}')
+    return '\n'.join(lines)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_stub_server(workdir, labels_path, startup_timeout=120.0):
+    repo = os.path.dirname(os.path.abspath(__file__))
+    with open(labels_path, 'r') as f:
+        n_classes = len(json.load(f))
+    model_path = os.path.join(workdir, 'model.npz')
+    stub_model(model_path, n_classes)
+    port = free_port()
+    # Everything the stub server writes (uploads, history) stays inside the throwaway workdir
+    env = dict(os.environ, MODEL_PATH=model_path, MODELS_DIR=os.path.join(workdir, 'models'),
+               HISTORY_DB=os.path.join(workdir, 'history.db'), UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               PORT=str(port), FLASK_DEBUG='0')
+    server = subprocess.Popen([sys.executable, os.path.join(repo, 'app.py')], cwd=repo, env=env)
+    url = f'http://127.0.0.1:{port}/'
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'Stub server exited with code {server.returncode}')
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return server, url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    server.terminate()
+    raise SystemExit('Stub server did not start in time')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the classification endpoint')
+    parser.add_argument('--url', default='http://127.0.0.1:7860/')
+    parser.add_argument('--corpus', help='directory of audio files to replay')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=None, help='open-loop arrival rate (requests/s)')
+    parser.add_argument('--max-backlog', type=int, default=None,
+                        help='open-loop requests queued beyond --concurrency before arrivals are dropped '
+                             '(default: --concurrency)')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--server-pid', type=int, default=None, help='sample this PID\'s RSS')
+    parser.add_argument('--stub', action='store_true', help='start app.py with a random stub model')
+    parser.add_argument('--labels', default='prediction.json')
+    parser.add_argument('--output', default=None, help='results JSON (default: loadtest-<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results JSON to print deltas against')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    server = sampler = None
+    url, pid = args.url, args.server_pid
+    try:
+        if args.stub:
+            server, url = start_stub_server(workdir, args.labels)
+            pid = server.pid
+        corpus = args.corpus
+        if corpus is None:
+            corpus = os.path.join(workdir, 'corpus')
+            synth_corpus(corpus)
+        payloads = [multipart('audio', name, data) for name, data in load_corpus(corpus)]
+
+        sampler = RssSampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+        started = time.perf_counter()
+        results, dropped = run_load(url, payloads, args.concurrency, args.duration, args.rate, args.timeout,
+                                    max_backlog=args.max_backlog)
+    finally:
+        if sampler:
+            sampler.stopped.set()
+        if server:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    rss_samples = sampler.samples if sampler else []
+    summary = summarize(results, started, rss_samples, dropped)
+    report = {
+        'config': {'url': url, 'corpus': args.corpus, 'files': len(payloads), 'concurrency': args.concurrency,
+                   'rate': args.rate, 'max_backlog': args.max_backlog, 'duration': args.duration,
+                   'stub': args.stub},
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'summary': summary,
+        'rss_timeline': rss_samples,
+    }
+    output = args.output or f'loadtest-{time.strftime("%Y%m%d-%H%M%S")}.json'
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    print(json.dumps(summary, indent=1))
+    print(f'Saved: {output}')
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print(compare(summary, json.load(f)['summary']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import os
+import gc
+import time
+import signal
+import logging
+import threading
+import tracemalloc
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMonitor:
+    """Periodic RSS sampling, tracemalloc snapshot diffs and optional worker recycling.
+
+    RSS is sampled every `interval` seconds alongside the number of requests
+    served so far, so growth can be reported per request. With `trace_frames`
+    set, tracemalloc runs and a snapshot is taken every `snapshot_interval`
+    seconds and diffed against the previous one to find the allocation sites
+    that keep growing. Once RSS exceeds `max_rss_mb` the worker is recycled with
+    SIGINT, which stops the server normally (running atexit handlers) so the
+    container or process manager can restart it.
+    """
+
+    def __init__(self, interval=10.0, history=360, trace_frames=0, snapshot_interval=300.0, top=20,
+                 max_rss_mb=None, on_recycle=None):
+        self.interval = interval
+        self.samples = deque(maxlen=history)
+        self.trace_frames = trace_frames
+        self.snapshot_interval = snapshot_interval
+        self.top = top
+        self.max_rss = max_rss_mb * 2 ** 20 if max_rss_mb else None
+        self.on_recycle = on_recycle or (lambda: os.kill(os.getpid(), signal.SIGINT))
+        self.requests = 0
+        self.started = time.time()
+        self.recycling = False
+        self._snapshot = None
+        self._snapshot_at = 0.0
+        self._top_growth = []
+        self._object_counts = None
+        self._lock = threading.Lock()
+        if trace_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(trace_frames)
+
+    @classmethod
+    def from_env(cls):
+        max_rss = os.environ.get('MEMDIAG_MAX_RSS_MB')
+        return cls(
+            interval=float(os.environ.get('MEMDIAG_INTERVAL', 10.0)),
+            trace_frames=int(os.environ.get('MEMDIAG_TRACEMALLOC', 0)),
+            snapshot_interval=float(os.environ.get('MEMDIAG_SNAPSHOT_INTERVAL', 300.0)),
+            max_rss_mb=float(max_rss) if max_rss else None,
+        )
+
+    def start(self):
+        threading.Thread(target=self._run, name='memory-monitor', daemon=True).start()
+        return self
+
+    def request_done(self):
+        with self._lock:
+            self.requests += 1
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception:
+                logger.exception('Memory sampling failed')
+            time.sleep(self.interval)
+
+    def sample(self):
+        rss = current_rss()
+        now = time.time()
+        self.samples.append((round(now - self.started, 1), self.requests, rss))
+        if tracemalloc.is_tracing() and now - self._snapshot_at >= self.snapshot_interval:
+            self.snapshot()
+        if self.max_rss and rss > self.max_rss and not self.recycling:
+            self.recycling = True
+            logger.warning('RSS %.1f MB exceeds %.1f MB after %d requests; recycling worker',
+                           rss / 2 ** 20, self.max_rss / 2 ** 20, self.requests)
+            self.on_recycle()
+        return rss
+
+    def snapshot(self):
+        """Take a tracemalloc snapshot and diff it against the previous one."""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        with self._lock:
+            if self._snapshot is not None:
+                stats = snapshot.compare_to(self._snapshot, 'lineno')
+                self._top_growth = [{
+                    'site': str(stat.traceback[0]),
+                    'size_kb': round(stat.size / 1024, 1),
+                    'size_diff_kb': round(stat.size_diff / 1024, 1),
+                    'count_diff': stat.count_diff,
+                } for stat in stats[:self.top]]
+            self._snapshot = snapshot
+            self._snapshot_at = time.time()
+
+    def object_counts(self):
+        """Live objects per type, with the change since the previous call."""
+        counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+        with self._lock:
+            previous, self._object_counts = self._object_counts, counts
+        return [{'type': name, 'count': count, 'diff': count - previous.get(name, 0) if previous else None}
+                for name, count in counts.most_common(self.top)]
+
+    def growth_per_request(self):
+        """Least-squares slope of RSS against requests served, in bytes per request."""
+        # Copy first: the sampler thread appends to (and rotates) the deque while we iterate
+        points = [(requests, rss) for _, requests, rss in list(self.samples)]
+        if len(points) < 2 or points[-1][0] == points[0][0]:
+            return None
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        if not var_x:
+            return None
+        return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+    def report(self, objects=False):
+        rss = current_rss()
+        samples = list(self.samples)
+        first = samples[0] if samples else None
+        growth = self.growth_per_request()
+        report = {
+            'rss_mb': round(rss / 2 ** 20, 1),
+            'rss_start_mb': round(first[2] / 2 ** 20, 1) if first else None,
+            'max_rss_mb': round(self.max_rss / 2 ** 20, 1) if self.max_rss else None,
+            'uptime_s': round(time.time() - self.started, 1),
+            'requests': self.requests,
+            'growth_kb_per_request': round(growth / 1024, 2) if growth is not None else None,
+            'samples': [{'t': t, 'requests': requests, 'rss_mb': round(value / 2 ** 20, 1)}
+                        for t, requests, value in samples],
+            'tracemalloc': tracemalloc.is_tracing(),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            with self._lock:
+                report.update(traced_mb=round(current / 2 ** 20, 1), traced_peak_mb=round(peak / 2 ** 20, 1),
+                              top_growth=list(self._top_growth))
+        if objects:
+            report['objects'] = self.object_counts()
+        return report
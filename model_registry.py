@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import time
+import random
+import logging
+import threading
+
+import numpy as np
+
+from numpy_model import load_model
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILES = ('model.npz', 'model.h5')
+LABELS_FILE = 'prediction.json'
+
+
+class ModelVersion:
+    """A loaded, warmed-up model and its label map, tagged with a version name."""
+
+    def __init__(self, name, model_path, labels_path):
+        self.name = name
+        self.model_path = model_path
+        self.signature = file_signature(model_path, labels_path)
+        self.model = load_model(model_path)
+        with open(labels_path, 'r') as f:
+            self.labels = json.load(f)
+        self.loaded_at = time.time()
+        self.input_shape = tuple(int(d) for d in tuple(self.model.input_shape)[-2:])
+        probs = self.model.predict(np.zeros((1,) + self.input_shape, dtype=np.float32), verbose=0)
+        if probs.shape[-1] != len(self.labels):
+            raise ValueError(f'{model_path} has {probs.shape[-1]} outputs but {labels_path} lists '
+                             f'{len(self.labels)} classes')
+
+    def predict(self, features):
+        return self.model.predict(features, verbose=0)
+
+    def info(self):
+        return {
+            'version': self.name,
+            'model': self.model_path,
+            'classes': len(self.labels),
+            'loaded_at': self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """Versioned model hosting with hot reload, rollback and traffic splitting.
+
+    Versions live in `models_dir/<version>/` as `model.npz` or `model.h5` plus
+    `prediction.json`; the naturally-sorted last directory is the newest. With no
+    versions directory, the top-level model and labels are served as
+    `default@<mtime>` and reloaded when their files change, so weights replaced
+    in place get a new version name.
+
+    A background thread polls for new versions, loads and warms them up off the
+    request path, then swaps them in with a single reference assignment, so
+    `select()` never blocks on a load. The replaced version is always kept for
+    instant `rollback()`.
+    """
+
+    def __init__(self, models_dir='models', default_model='model.h5', default_labels=LABELS_FILE,
+                 poll_interval=10.0):
+        self.models_dir = models_dir
+        self.default_model = default_model
+        self.default_labels = default_labels
+        self.poll_interval = poll_interval
+        self.active = None
+        self.previous = None
+        self.canary = None
+        self.canary_weight = 0.0
+        self._seen = {}        # version name -> file signature already loaded or rejected
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.poll()
+        if self.active is None:
+            raise RuntimeError(f'No loadable model found in {models_dir!r} or {default_model!r}')
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='model-registry', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Model registry poll failed')
+
+    def available(self):
+        """Map of version name -> (model path, labels path) for every complete version on disk."""
+        versions = {}
+        if os.path.isdir(self.models_dir):
+            for name in sorted(os.listdir(self.models_dir), key=natural_key):
+                paths = version_paths(os.path.join(self.models_dir, name))
+                if paths:
+                    versions[name] = paths
+        if not versions and os.path.exists(self.default_model):
+            versions[f'default@{int(os.path.getmtime(self.default_model))}'] = (self.default_model,
+                                                                                 self.default_labels)
+        return versions
+
+    def poll(self):
+        """Load the newest version if it has not been seen yet (or its files changed)."""
+        versions = self.available()
+        if not versions:
+            return
+        name, (model_path, labels_path) = list(versions.items())[-1]
+        signature = file_signature(model_path, labels_path)
+        with self._lock:
+            if self._seen.get(name) == signature:
+                return
+            self._seen[name] = signature
+        try:
+            version = ModelVersion(name, model_path, labels_path)
+        except Exception:
+            logger.exception('Failed to load model version %s', name)
+            return
+        self._swap(version)
+        logger.info('Activated model version %s', name)
+
+    def _swap(self, version):
+        with self._lock:
+            # Compared by identity: a file rewritten in place reloads as a new object with the same name
+            if self.active is not None and self.active is not version:
+                self.previous = self.active
+            self.active = version
+            if self.canary is not None and self.canary.name == version.name:
+                self.canary, self.canary_weight = None, 0.0
+
+    def load(self, name):
+        """A loaded version by name, loading it from disk (on the calling thread) if needed."""
+        for version in (self.active, self.previous, self.canary):
+            if version is not None and version.name == name:
+                return version
+        paths = self.available().get(name)
+        if paths is None:
+            raise KeyError(name)
+        version = ModelVersion(name, *paths)
+        with self._lock:
+            self._seen[name] = version.signature
+        return version
+
+    def activate(self, name):
+        self._swap(self.load(name))
+
+    def rollback(self):
+        with self._lock:
+            if self.previous is None:
+                raise LookupError('No previous model version to roll back to')
+            self.active, self.previous = self.previous, self.active
+            return self.active
+
+    def split(self, name=None, weight=0.0):
+        """Route `weight` (0-1) of traffic to version `name`; no name clears the split."""
+        version = self.load(name) if name else None
+        with self._lock:
+            self.canary = version
+            self.canary_weight = min(max(float(weight), 0.0), 1.0) if version else 0.0
+
+    def select(self):
+        canary, weight = self.canary, self.canary_weight
+        if canary is not None and random.random() < weight:
+            return canary
+        return self.active
+
+    def status(self):
+        return {
+            'active': self.active.info(),
+            'previous': self.previous.info() if self.previous else None,
+            'canary': dict(self.canary.info(), weight=self.canary_weight) if self.canary else None,
+            'available': list(self.available()),
+        }
+
+
+def version_paths(directory):
+    labels_path = os.path.join(directory, LABELS_FILE)
+    if not os.path.isfile(labels_path):
+        return None
+    for model_file in MODEL_FILES:
+        model_path = os.path.join(directory, model_file)
+        if os.path.isfile(model_path):
+            return model_path, labels_path
+    return None
+
+
+def file_signature(*paths):
+    return tuple((os.path.getmtime(p), os.path.getsize(p)) for p in paths)
+
+
+def natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
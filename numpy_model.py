@@ -0,0 +1,104 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': relu,
+    'softmax': softmax,
+}
+
+
+def conv1d(x, w, b):
+    # x: (N, L, Cin), w: (K, Cin, Cout), 'valid' padding, stride 1
+    k, c_in, c_out = w.shape
+    windows = sliding_window_view(x, k, axis=1)                  # (N, L-K+1, Cin, K)
+    kernel = w.transpose(1, 0, 2).reshape(c_in * k, c_out)       # matches (Cin, K) window order
+    n, l_out = windows.shape[:2]
+    out = windows.reshape(n * l_out, c_in * k) @ kernel
+    out += b
+    return out.reshape(n, l_out, c_out)
+
+
+def maxpool1d(x, pool_size):
+    # Keras MaxPool1D(padding='same', strides=pool_size): like TF, put pad // 2 before the data and the
+    # rest after it, and ignore padded values
+    n, length, c = x.shape
+    l_out = -(-length // pool_size)
+    pad = l_out * pool_size - length
+    if pad:
+        before, after = pad // 2, pad - pad // 2
+        x = np.concatenate([np.full((n, before, c), -np.inf, dtype=x.dtype), x,
+                            np.full((n, after, c), -np.inf, dtype=x.dtype)], axis=1)
+    return x.reshape(n, l_out, pool_size, c).max(axis=2)
+
+
+class NumpyModel:
+    """Pure-NumPy forward pass over weights written by `export_npz.py`.
+
+    Exposes `predict(x)` with the same input/output shapes as the Keras model,
+    so it can be dropped in wherever `model.predict` is called.
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.input_shape = tuple(int(d) for d in data['input_shape'])
+            ops = [str(op) for op in data['ops']]
+            acts = [str(act) for act in data['acts']]
+            pools = data['pool'].tolist()
+            self.layers = []
+            for i, (op, act, pool) in enumerate(zip(ops, acts, pools)):
+                params = ()
+                if op in ('conv1d', 'dense', 'affine'):
+                    params = (data[f'w{i}'].astype(np.float32), data[f'b{i}'].astype(np.float32))
+                elif op == 'maxpool1d':
+                    params = (int(pool),)
+                self.layers.append((op, ACTIVATIONS[act], params))
+
+    def predict(self, x, batch_size=1024, verbose=0):
+        x = np.asarray(x, dtype=np.float32).reshape((-1,) + self.input_shape)
+        outputs = [self._forward(x[i:i + batch_size]) for i in range(0, len(x), batch_size)]
+        return np.concatenate(outputs) if outputs else np.empty((0, self.output_size), np.float32)
+
+    __call__ = predict
+
+    @property
+    def output_size(self):
+        for op, _, params in reversed(self.layers):
+            if op == 'dense':
+                return params[0].shape[1]
+        return 0
+
+    def _forward(self, x):
+        for op, activation, params in self.layers:
+            if op == 'conv1d':
+                x = conv1d(x, *params)
+            elif op == 'maxpool1d':
+                x = maxpool1d(x, *params)
+            elif op == 'flatten':
+                x = x.reshape(len(x), -1)
+            elif op == 'dense':
+                x = x @ params[0] + params[1]
+            elif op == 'affine':
+                x = x * params[0] + params[1]
+            x = activation(x)
+        return x
+
+
+def load_model(path):
+    """Load `model.npz` with NumPy, anything else (`model.h5`) with Keras."""
+    if path.endswith('.npz'):
+        return NumpyModel(path)
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
@@ -0,0 +1,253 @@
+"""CPU resource configuration for the serving process.
+
+TensorFlow's intra/inter-op pools, the BLAS pool under NumPy and numba's pool
+(used by librosa) each default to every core, which oversubscribes the CPU when
+several workers share a host. `configure()` sizes all of them per worker and can
+pin the worker to a set of cores. It only imports the standard library, and
+must run before NumPy/librosa/TensorFlow are imported because the BLAS and numba
+pools read their sizes from the environment at import time.
+
+Environment: `WORKER_THREADS`, `WORKER_INTEROP_THREADS`, `CPU_AFFINITY`
+(`"0-3,8"` or `"auto"`, which uses `WORKER_INDEX` to pick a disjoint block).
+`auto` requires `WORKER_INDEX` to be set to a distinct 0-based number in each
+worker's environment (e.g. from the process manager's instance number);
+without it every worker would be pinned to the same cores, so it is refused.
+
+    python resources.py autotune --corpus samples/ --objective throughput
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+    'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS', 'NUMBA_NUM_THREADS',
+)
+
+applied = {}
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpus(spec):
+    cpus = []
+    for part in spec.split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            cpus.extend(range(int(start), int(end) + 1))
+        elif part.strip():
+            cpus.append(int(part))
+    return cpus
+
+
+def configure(threads=None, interop_threads=None, affinity=None, worker_index=0):
+    """Size every thread pool to `threads` and optionally pin this process to `affinity` cores."""
+    cpus = available_cpus()
+    if affinity == 'auto':
+        block = threads or 1
+        start = (worker_index * block) % len(cpus)
+        affinity = cpus[start:start + block] or cpus[:block]
+    elif isinstance(affinity, str):
+        affinity = parse_cpus(affinity)
+    if affinity and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, affinity)
+        threads = threads or len(affinity)
+
+    if threads:
+        for var in THREAD_ENV_VARS:
+            os.environ[var] = str(threads)
+        os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+        os.environ['TF_NUM_INTEROP_THREADS'] = str(interop_threads or 1)
+        apply_runtime(threads, interop_threads or 1)
+
+    applied.update(threads=threads, interop_threads=interop_threads or (1 if threads else None),
+                   affinity=list(affinity) if affinity else None, worker_index=worker_index)
+    return dict(applied)
+
+
+def apply_runtime(threads, interop_threads):
+    """Resize pools of libraries that were already imported before `configure()` ran."""
+    if 'numpy' in sys.modules:
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(threads)
+        except ImportError:
+            pass
+    if 'numba' in sys.modules:
+        import numba
+        numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+    if 'tensorflow' in sys.modules:
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(interop_threads)
+        except RuntimeError:
+            # TensorFlow's runtime is already initialised; the pools can no longer be resized
+            pass
+
+
+def configure_from_env():
+    threads = os.environ.get('WORKER_THREADS')
+    interop = os.environ.get('WORKER_INTEROP_THREADS')
+    affinity = os.environ.get('CPU_AFFINITY') or None
+    if affinity == 'auto' and 'WORKER_INDEX' not in os.environ:
+        raise RuntimeError('CPU_AFFINITY=auto needs a distinct WORKER_INDEX (0, 1, ...) in each worker')
+    return configure(
+        threads=int(threads) if threads else None,
+        interop_threads=int(interop) if interop else None,
+        affinity=affinity,
+        worker_index=int(os.environ.get('WORKER_INDEX', 0)),
+    )
+
+
+def bench(corpus, duration, warmup=2, barrier=None):
+    """Run `predict_audio` over the corpus for `duration` seconds in this (configured) process.
+
+    With `barrier` (a directory shared with the other workers), the worker
+    reports ready after warm-up and waits for the common start time the parent
+    writes there, so every worker's window covers the same wall-clock interval.
+    """
+    import app
+    from loadtest import AUDIO_EXTENSIONS
+
+    # Only audio: one stray README or .DS_Store would crash every worker and score the layout as zero
+    files = [os.path.join(corpus, name) for name in sorted(os.listdir(corpus))
+             if name.lower().endswith(AUDIO_EXTENSIONS)]
+    if not files:
+        raise SystemExit(f'No audio files ({", ".join(AUDIO_EXTENSIONS)}) in {corpus}')
+    for path in files[:warmup]:
+        app.predict_audio(path)
+    start_at = time.time()
+    if barrier:
+        open(os.path.join(barrier, f'ready-{os.getpid()}'), 'w').close()
+        go = os.path.join(barrier, 'go')
+        while not os.path.exists(go):
+            time.sleep(0.01)
+        with open(go, 'r') as f:
+            start_at = float(f.read())
+        time.sleep(max(0.0, start_at - time.time()))
+    latencies = []
+    deadline = start_at + duration
+    while time.time() < deadline:
+        for path in files:
+            started = time.perf_counter()
+            app.predict_audio(path)
+            latencies.append(time.perf_counter() - started)
+            if time.time() >= deadline:
+                break
+    return latencies
+
+
+def release_barrier(barrier, procs, timeout=600.0, lead=0.5):
+    """Once every live worker is warmed up, publish a start time `lead` seconds from now."""
+    waited_until = time.time() + timeout
+    while time.time() < waited_until:
+        ready = sum(name.startswith('ready-') for name in os.listdir(barrier))
+        if ready >= sum(proc.poll() is None for proc in procs):
+            break
+        time.sleep(0.05)
+    pending = os.path.join(barrier, 'go.tmp')
+    with open(pending, 'w') as f:
+        f.write(repr(time.time() + lead))
+    os.replace(pending, os.path.join(barrier, 'go'))
+
+
+def candidate_configs(n_cpus):
+    configs = []
+    threads = 1
+    while threads <= n_cpus:
+        configs.append({'workers': n_cpus // threads, 'threads': threads})
+        threads *= 2
+    if configs[-1]['threads'] != n_cpus:
+        configs.append({'workers': 1, 'threads': n_cpus})
+    # Oversubscribed baseline: every worker sized to all cores, as by default
+    configs.append({'workers': n_cpus, 'threads': None})
+    return configs
+
+
+def run_config(config, corpus, duration, pin):
+    with tempfile.TemporaryDirectory(prefix='autotune-') as barrier:
+        return _run_config(config, corpus, duration, pin, barrier)
+
+
+def _run_config(config, corpus, duration, pin, barrier):
+    procs = []
+    for index in range(config['workers']):
+        env = dict(os.environ, WORKER_INDEX=str(index))
+        env.pop('WORKER_THREADS', None)
+        env.pop('CPU_AFFINITY', None)
+        if config['threads']:
+            env['WORKER_THREADS'] = str(config['threads'])
+            if pin:
+                env['CPU_AFFINITY'] = 'auto'
+        cmd = [sys.executable, os.path.abspath(__file__), 'bench', '--corpus', corpus, '--duration', str(duration),
+               '--barrier', barrier]
+        procs.append(subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, cwd=os.path.dirname(os.path.abspath(__file__))))
+    # Workers import the app and warm up at different speeds; start all timing windows together
+    release_barrier(barrier, procs)
+    latencies = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode == 0:
+            latencies.extend(json.loads(out.decode().strip().splitlines()[-1]))
+    latencies.sort()
+    if not latencies:
+        return dict(config, throughput=0.0, p50_ms=None, p95_ms=None)
+    return dict(
+        config,
+        throughput=round(len(latencies) / duration, 2),
+        p50_ms=round(latencies[len(latencies) // 2] * 1000, 1),
+        p95_ms=round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Thread pool configuration and autotuning')
+    sub = parser.add_subparsers(dest='command', required=True)
+    tune = sub.add_parser('autotune', help='benchmark worker/thread layouts on predict_audio')
+    tune.add_argument('--corpus', required=True, help='directory of audio files')
+    tune.add_argument('--duration', type=float, default=20.0, help='seconds per configuration')
+    tune.add_argument('--objective', choices=('throughput', 'latency'), default='throughput')
+    tune.add_argument('--no-pin', action='store_true', help='do not pin workers to cores')
+    tune.add_argument('--output', default='autotune.json')
+    run = sub.add_parser('bench', help=argparse.SUPPRESS)
+    run.add_argument('--corpus', required=True)
+    run.add_argument('--duration', type=float, default=20.0)
+    run.add_argument('--barrier', default=None)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        configure_from_env()
+        print(json.dumps(bench(args.corpus, args.duration, barrier=args.barrier)))
+        return
+
+    results = []
+    for config in candidate_configs(len(available_cpus())):
+        result = run_config(config, args.corpus, args.duration, pin=not args.no_pin)
+        print(json.dumps(result))
+        results.append(result)
+
+    measured = [r for r in results if r['p50_ms'] is not None]
+    if not measured:
+        raise SystemExit('No configuration completed; check that the app starts and the corpus is readable')
+    if args.objective == 'throughput':
+        best = max(measured, key=lambda r: r['throughput'])
+    else:
+        best = min(measured, key=lambda r: (r['p95_ms'], -r['throughput']))
+    with open(args.output, 'w') as f:
+        json.dump({'objective': args.objective, 'best': best, 'results': results}, f, indent=1)
+    print(f'Recommended: {best["workers"]} workers x WORKER_THREADS={best["threads"]}'
+          f'{" with CPU_AFFINITY=auto" if best["threads"] and not args.no_pin else ""}')
+    print(f'Saved: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import math
+
+import numpy as np
+import librosa
+import scipy.fft
+import soxr
+
+# librosa.feature.mfcc defaults, so a streamed window scores like an uploaded clip
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 40
+TOP_DB = 80.0
+MAX_SAMPLE_RATE = 192000
+WINDOW_RANGE = (0.5, 30.0)    # seconds of audio per prediction
+HOP_RANGE = (0.1, 60.0)       # seconds between predictions
+PCM_FORMATS = ('s16', 'f32')
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO of rows; the oldest rows are overwritten once full."""
+
+    def __init__(self, capacity, width, dtype=np.float32):
+        self.data = np.zeros((capacity, width), dtype=dtype)
+        self.capacity = capacity
+        self.size = 0
+        self.start = 0
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, rows):
+        rows = rows[-self.capacity:]
+        n = len(rows)
+        end = (self.start + self.size) % self.capacity
+        first = min(n, self.capacity - end)
+        self.data[end:end + first] = rows[:first]
+        self.data[:n - first] = rows[first:]
+        overflow = max(0, self.size + n - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + n)
+
+    def view(self):
+        """Rows in arrival order (a copy only when the buffer has wrapped)."""
+        end = self.start + self.size
+        if end <= self.capacity:
+            return self.data[self.start:end]
+        return np.concatenate([self.data[self.start:], self.data[:end - self.capacity]])
+
+
+class StreamClassifier:
+    """Rolling species prediction over a live PCM stream.
+
+    Incoming samples are framed as they arrive and only the new STFT frames are
+    turned into log-mel rows, which are kept in a ring covering the last
+    `window` seconds. Every `hop` seconds the window is reduced to the same
+    40-coefficient MFCC mean that `predict_audio` feeds the model: because the
+    DCT is linear, the mean of the clipped log-mel rows is transformed once
+    instead of per frame.
+    """
+
+    def __init__(self, registry, window=5.0, hop=1.0, sr=SAMPLE_RATE):
+        if not 0 < sr <= MAX_SAMPLE_RATE:
+            raise ValueError(f'Sample rate must be between 1 and {MAX_SAMPLE_RATE} Hz')
+        for name, value, (low, high) in (('window', window, WINDOW_RANGE), ('hop', hop, HOP_RANGE)):
+            if not (math.isfinite(value) and low <= value <= high):
+                raise ValueError(f'{name} must be between {low} and {high} seconds')
+        self.registry = registry
+        self.sr = sr
+        # Stateful resampler: filter history carries across chunk boundaries, so chunks join seamlessly
+        self.resampler = soxr.ResampleStream(sr, SAMPLE_RATE, 1, dtype='float32') if sr != SAMPLE_RATE else None
+        self.emit_samples = int(hop * SAMPLE_RATE)
+        self.frames = RingBuffer(max(1, int(window * SAMPLE_RATE) // HOP_LENGTH), N_MELS)
+        self.audio = np.zeros(0, dtype=np.float32)   # samples not yet consumed by a full frame
+        self.since_emit = 0
+        self.position = 0
+
+    def feed(self, samples):
+        """Add a chunk of mono float samples; return a prediction dict once per hop."""
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.resampler is not None:
+            samples = self.resampler.resample_chunk(samples)
+        self.position += len(samples)
+        self.since_emit += len(samples)
+        self.audio = np.concatenate([self.audio, samples])
+
+        if len(self.audio) >= N_FFT:
+            n_frames = 1 + (len(self.audio) - N_FFT) // HOP_LENGTH
+            used = (n_frames - 1) * HOP_LENGTH + N_FFT
+            self.frames.extend(log_mel_frames(self.audio[:used]))
+            self.audio = self.audio[n_frames * HOP_LENGTH:]
+
+        if self.since_emit < self.emit_samples or not len(self.frames):
+            return None
+        self.since_emit = 0
+        return self.predict()
+
+    def features(self):
+        log_mel = self.frames.view()
+        log_mel = np.maximum(log_mel, log_mel.max() - TOP_DB)
+        mfcc = scipy.fft.dct(log_mel.mean(axis=0), type=2, norm='ortho')[:N_MFCC]
+        return mfcc.astype(np.float32)
+
+    def predict(self):
+        version = self.registry.select()
+        pred = version.predict(self.features().reshape(1, N_MFCC, 1))[0]
+        label_index = int(np.argmax(pred))
+        return {
+            'class': version.labels[str(label_index)],
+            'confidence': round(float(pred[label_index]) * 100, 2),
+            'time': round(self.position / SAMPLE_RATE, 3),
+            'window': round(len(self.frames) * HOP_LENGTH / SAMPLE_RATE, 3),
+            'model_version': version.name,
+        }
+
+
+# Shared by every connection; at 128 x 1025 float32 it is larger than a connection's frame ring
+MEL_BASIS = librosa.filters.mel(sr=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS).astype(np.float32)
+
+
+def log_mel_frames(audio):
+    """Log-power mel rows, shape (frames, N_MELS), for un-padded frames of `audio`."""
+    spec = np.abs(librosa.stft(audio, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False)) ** 2
+    return librosa.power_to_db(MEL_BASIS @ spec, top_db=None).T
+
+
+def decode_pcm(message, sample_format='s16'):
+    """Decode a binary websocket message of little-endian mono PCM to float32."""
+    if sample_format not in PCM_FORMATS:
+        raise ValueError(f'Unknown PCM format {sample_format!r}; expected one of {", ".join(PCM_FORMATS)}')
+    if sample_format == 'f32':
+        samples = np.frombuffer(message, dtype='<f4')
+        # NaN/inf would poison the frame ring and serialize as invalid JSON
+        if not np.isfinite(samples).all():
+            raise ValueError('PCM chunk contains non-finite samples')
+        return samples
+    return np.frombuffer(message, dtype='<i2').astype(np.float32) / 32768.0
@@ -0,0 +1,26 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('librosa')
+
+from activity import ActivityGate
+
+
+def test_off_passes_short_clips_through():
+    audio = np.ones(100, dtype=np.float32)
+    kept, stats = ActivityGate(method='off')(audio, 22050)
+    assert len(kept) == len(audio)
+    assert stats['skipped_fraction'] == 0.0
+
+
+def test_thresholds_default_per_method():
+    assert ActivityGate(method='energy').threshold == 10.0
+    assert ActivityGate(method='flux').threshold == 3.0
+
+
+def test_env_config_matches_server_gate(monkeypatch):
+    monkeypatch.setenv('GATE_METHOD', 'energy')
+    monkeypatch.setenv('GATE_HANGOVER', '0.5')
+    config = ActivityGate.env_config('flux')
+    assert config['method'] == 'flux' and config['hangover'] == 0.5
+    assert ActivityGate.from_env().hangover == 0.5
@@ -0,0 +1,33 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from edge_features import SAMPLE_RATE, dct_matrix, mfcc_mean
+
+
+def synthetic_audio(seconds=3.0, seed=0):
+    # Two overlapping chirps in the song-bird range over low-level noise, then a silent tail
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = 0.4 * np.sin(2 * np.pi * (2000 * t + 800 * t ** 2))
+    audio += 0.2 * np.sin(2 * np.pi * (6000 * t - 500 * t ** 2)) * (t > 1.0)
+    audio += 0.01 * rng.standard_normal(len(t))
+    audio[-SAMPLE_RATE // 2:] = 0.0
+    return audio.astype(np.float32)
+
+
+def test_dct_matrix_matches_scipy():
+    scipy_fft = pytest.importorskip('scipy.fft')
+    x = np.random.default_rng(1).normal(size=128)
+    np.testing.assert_allclose(dct_matrix() @ x, scipy_fft.dct(x, norm='ortho')[:40], atol=1e-10)
+
+
+@pytest.mark.parametrize('seconds', [0.05, 3.0])
+def test_mfcc_mean_matches_librosa(seconds):
+    pytest.importorskip('librosa')
+    from features import mfcc_mean as server_mfcc_mean
+
+    audio = synthetic_audio(seconds)
+    edge = mfcc_mean(audio)
+    assert edge.shape == (40,) and edge.dtype == np.float32
+    np.testing.assert_allclose(edge, server_mfcc_mean(audio, SAMPLE_RATE), rtol=1e-3, atol=1e-2)
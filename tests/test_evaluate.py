@@ -0,0 +1,43 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from evaluate import class_names_from_labels, confusion_matrix, evaluate, per_class_metrics, top_k_accuracy
+
+
+def test_per_class_metrics_on_hand_built_matrix():
+    # Rows are true classes, columns predictions; class 2 is never predicted
+    cm = np.array([[3, 1, 0],
+                   [0, 2, 0],
+                   [1, 1, 0]])
+    precision, recall, f1, support = per_class_metrics(cm)
+    np.testing.assert_allclose(precision, [3 / 4, 2 / 4, 0])
+    np.testing.assert_allclose(recall, [3 / 4, 1, 0])
+    np.testing.assert_allclose(f1, [3 / 4, 2 / 3, 0])
+    np.testing.assert_array_equal(support, [4, 2, 2])
+
+
+def test_confusion_matrix_counts_pairs():
+    cm = confusion_matrix(np.array([0, 0, 1, 2]), np.array([0, 1, 1, 0]), 3)
+    np.testing.assert_array_equal(cm, [[1, 1, 0], [0, 1, 0], [1, 0, 0]])
+
+
+def test_top_k_accuracy():
+    probs = np.array([[0.5, 0.3, 0.2],
+                      [0.1, 0.2, 0.7],
+                      [0.6, 0.1, 0.3]])
+    y_true = np.array([1, 2, 1])
+    assert top_k_accuracy(probs, y_true, 1) == pytest.approx(1 / 3)
+    assert top_k_accuracy(probs, y_true, 2) == pytest.approx(2 / 3)
+    assert top_k_accuracy(probs, y_true, 5) == 1.0
+
+
+def test_label_map_gaps_and_output_mismatch():
+    assert class_names_from_labels({'0': 'a', '2': 'c'}) == ['a', '<class 1>', 'c']
+
+    class Model:
+        def predict(self, x, batch_size=None, verbose=0):
+            return np.full((len(x), 4), 0.25, dtype=np.float32)
+
+    with pytest.raises(ValueError):
+        evaluate(Model(), np.zeros((2, 40), np.float32), np.array([0, 1]), ['a', 'b', 'c'])
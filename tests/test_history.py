@@ -0,0 +1,57 @@
+import pytest
+
+from history import COLUMNS, HistoryStore, parse_time
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    yield store
+    store.close()
+
+
+def result(species):
+    return {'class': species, 'confidence': 90.0, 'top_k': [], 'model_version': 'v1', 'latency_ms': 5.0,
+            'activity': {'duration': 5.0, 'active_seconds': 4.0}}
+
+
+def test_pagination_follows_next_before_id(store):
+    for i in range(5):
+        store.record(f'hash{i}', result('robin'))
+    store.close()
+
+    first = store.query(limit=2)
+    assert [row['content_hash'] for row in first['items']] == ['hash4', 'hash3']
+    second = store.query(limit=2, before_id=first['next_before_id'])
+    assert [row['content_hash'] for row in second['items']] == ['hash2', 'hash1']
+    last = store.query(limit=2, before_id=second['next_before_id'])
+    assert [row['content_hash'] for row in last['items']] == ['hash0']
+    assert last['next_before_id'] is None
+    assert store.query(limit=2, before_id=1) == {'items': [], 'next_before_id': None}
+
+
+@pytest.mark.parametrize('limit', [0, -1, 1001])
+def test_limit_out_of_range(store, limit):
+    with pytest.raises(ValueError):
+        store.query(limit=limit)
+
+
+def test_summary_buckets_by_utc_day(store):
+    day = parse_time('2026-10-12')
+    rows = [(day + 3600, 'a', None, 'robin', 80.0, '[]', 'v1', 5.0, 4.0, 5.0),
+            (day + 23 * 3600, 'b', None, 'robin', 90.0, '[]', 'v1', 5.0, 4.0, 5.0),
+            (day + 25 * 3600, 'c', None, 'wren', 70.0, '[]', 'v1', 5.0, 4.0, 5.0),
+            (day + 26 * 3600, 'd', None, None, None, '[]', 'v1', 5.0, 0.0, 5.0)]
+    with store.connect() as conn:
+        conn.executemany(f'INSERT INTO predictions ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})',
+                         rows)
+
+    summary = store.summary(bucket='day')
+    assert summary['total'] == 4 and summary['no_bird'] == 1
+    assert {row['species']: row['count'] for row in summary['species']} == {'robin': 2, 'wren': 1}
+    buckets = {(row['bucket'], row['species']): row['count'] for row in summary['buckets']}
+    assert buckets[('2026-10-12', 'robin')] == 2
+    assert buckets[('2026-10-13', 'wren')] == 1
+    # A naive ISO date filters on the same UTC day boundary the buckets use
+    assert store.summary(since='2026-10-13')['total'] == 2
+    assert parse_time('2026-10-12T00:00:00+02:00') == day - 7200
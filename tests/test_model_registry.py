@@ -0,0 +1,43 @@
+import os
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from model_registry import ModelRegistry, ModelVersion
+
+
+def write_model(directory, n_classes=3, seed=0, n_labels=None):
+    # Smallest NumpyModel: flatten + softmax dense over a (40, 1) input
+    rng = np.random.default_rng(seed)
+    model_path = os.path.join(directory, 'model.npz')
+    np.savez(model_path, ops=np.array(['flatten', 'dense']), acts=np.array(['linear', 'softmax']),
+             pool=np.zeros(2, dtype=np.int32), input_shape=np.array([40, 1]),
+             w1=rng.normal(size=(40, n_classes)).astype(np.float32), b1=np.zeros(n_classes, np.float32))
+    labels_path = os.path.join(directory, 'prediction.json')
+    with open(labels_path, 'w') as f:
+        json.dump({str(i): f'bird {i}' for i in range(n_labels or n_classes)}, f)
+    return model_path, labels_path
+
+
+def test_in_place_reload_gets_new_name_and_can_roll_back(tmp_path):
+    model_path, labels_path = write_model(str(tmp_path), seed=0)
+    os.utime(model_path, (1_000_000, 1_000_000))
+    registry = ModelRegistry(str(tmp_path / 'models'), default_model=model_path, default_labels=labels_path)
+    first = registry.active
+
+    write_model(str(tmp_path), seed=1)
+    os.utime(model_path, (2_000_000, 2_000_000))
+    registry.poll()
+
+    assert registry.active.name != first.name
+    assert registry.active.name.startswith('default@')
+    assert registry.previous is first
+    assert registry.rollback() is first
+
+
+def test_label_count_must_match_model_outputs(tmp_path):
+    model_path, labels_path = write_model(str(tmp_path), n_classes=3, n_labels=2)
+    with pytest.raises(ValueError):
+        ModelVersion('v1', model_path, labels_path)
@@ -0,0 +1,83 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from numpy_model import NumpyModel, conv1d, maxpool1d
+
+
+def test_conv1d_matches_direct_loop():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(2, 10, 3)).astype(np.float32)
+    w = rng.normal(size=(3, 3, 4)).astype(np.float32)
+    b = rng.normal(size=4).astype(np.float32)
+    expected = np.stack([
+        np.stack([np.einsum('kc,kco->o', x[n, i:i + 3], w) + b for i in range(8)]) for n in range(2)
+    ])
+    np.testing.assert_allclose(conv1d(x, w, b), expected, rtol=1e-5, atol=1e-5)
+
+
+def test_maxpool1d_same_padding_keeps_odd_tail():
+    x = np.arange(2 * 5 * 1, dtype=np.float32).reshape(2, 5, 1) * -1
+    out = maxpool1d(x, 2)
+    assert out.shape == (2, 3, 1)
+    np.testing.assert_array_equal(out[0, :, 0], [0, -2, -4])
+
+
+def test_maxpool1d_splits_padding_like_keras():
+    # Length 4 with pool 3 pads 2: one slot before the data and one after, as TF's 'same' padding does
+    x = -np.arange(4, dtype=np.float32).reshape(1, 4, 1)
+    np.testing.assert_array_equal(maxpool1d(x, 3)[0, :, 0], [0, -2])
+
+
+def notebook_model(keras, n_classes=114, pool_size=2):
+    # Same layers as the notebook, with random (non-trivial) BatchNorm statistics
+    model = keras.Sequential([
+        keras.layers.Input(shape=(40, 1)),
+        keras.layers.Conv1D(filters=128, kernel_size=3, activation='relu'),
+        keras.layers.BatchNormalization(),
+        keras.layers.MaxPool1D(pool_size=pool_size, padding='same'),
+        keras.layers.Conv1D(filters=256, kernel_size=3, activation='relu'),
+        keras.layers.BatchNormalization(),
+        keras.layers.MaxPool1D(pool_size=pool_size, padding='same'),
+        keras.layers.Conv1D(filters=256, kernel_size=3, activation='relu'),
+        keras.layers.BatchNormalization(),
+        keras.layers.MaxPool1D(pool_size=pool_size, padding='same'),
+        keras.layers.Flatten(),
+        keras.layers.Dense(units=512, activation='relu', kernel_regularizer=keras.regularizers.L2(l2=1e-2)),
+        keras.layers.Dropout(rate=0.3),
+        keras.layers.Dense(units=512, activation='relu', kernel_regularizer=keras.regularizers.L2(l2=1e-2)),
+        keras.layers.Dropout(rate=0.3),
+        keras.layers.Dense(units=n_classes, activation='softmax'),
+    ])
+    rng = np.random.default_rng(0)
+    for layer in model.layers:
+        if type(layer).__name__ == 'BatchNormalization':
+            n = layer.get_weights()[0].shape[0]
+            layer.set_weights([
+                rng.uniform(0.5, 1.5, n), rng.normal(0, 0.1, n), rng.normal(0, 0.5, n), rng.uniform(0.5, 2.0, n),
+            ])
+    return model
+
+
+@pytest.mark.parametrize('negative_gamma, pool_size', [(False, 2), (True, 2), (False, 3)])
+def test_export_matches_keras(tmp_path, negative_gamma, pool_size):
+    tf = pytest.importorskip('tensorflow')
+    from export_npz import check, convert
+
+    model = notebook_model(tf.keras, pool_size=pool_size)
+    if negative_gamma:
+        # A negative BatchNorm scale does not commute with MaxPool, so it must stay an explicit affine op
+        bn = [layer for layer in model.layers if type(layer).__name__ == 'BatchNormalization'][0]
+        gamma, beta, mean, var = bn.get_weights()
+        gamma[0] = -1.0
+        bn.set_weights([gamma, beta, mean, var])
+
+    path = str(tmp_path / 'model.npz')
+    exported = convert(model)
+    np.savez(path, **exported)
+    assert ('affine' in list(exported['ops'])) == negative_gamma
+
+    max_diff, agreement = check(model, path)
+    assert max_diff < 1e-4
+    assert agreement == 1.0
+    assert NumpyModel(path).predict(np.zeros((3, 40, 1))).shape == (3, 114)
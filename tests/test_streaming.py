@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('librosa')
+pytest.importorskip('soxr')
+
+from streaming import SAMPLE_RATE, RingBuffer, StreamClassifier, decode_pcm
+
+
+def test_ring_buffer_keeps_arrival_order_after_wraparound():
+    ring = RingBuffer(capacity=5, width=2)
+    rows = np.arange(24, dtype=np.float32).reshape(12, 2)
+    seen = []
+    for chunk in (rows[:3], rows[3:4], rows[4:9], rows[9:12]):
+        ring.extend(chunk)
+        seen.extend(chunk.tolist())
+        np.testing.assert_array_equal(ring.view(), seen[-5:])
+    assert len(ring) == 5
+
+
+def test_ring_buffer_chunk_larger_than_capacity_keeps_newest_rows():
+    ring = RingBuffer(capacity=4, width=1)
+    ring.extend(np.arange(3, dtype=np.float32)[:, None])
+    ring.extend(np.arange(3, 13, dtype=np.float32)[:, None])
+    np.testing.assert_array_equal(ring.view()[:, 0], [9, 10, 11, 12])
+
+
+def test_decode_pcm_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        decode_pcm(b'\x00\x00', 'u8')
+
+
+def test_decode_pcm_rejects_non_finite_samples():
+    with pytest.raises(ValueError):
+        decode_pcm(np.array([0.0, np.nan], dtype='<f4').tobytes(), 'f32')
+
+
+@pytest.mark.parametrize('hop', [0.0, float('inf'), float('nan')])
+def test_stream_classifier_rejects_out_of_range_hop(hop):
+    with pytest.raises(ValueError):
+        StreamClassifier(None, hop=hop)
+
+
+def test_streamed_features_match_whole_clip():
+    import librosa
+    from features import mfcc_mean
+
+    rng = np.random.default_rng(0)
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    audio = (0.3 * np.sin(2 * np.pi * (2500 * t + 400 * t ** 2)) + 0.02 * rng.standard_normal(len(t)))
+    audio = audio.astype(np.float32)
+
+    # Uneven chunk sizes, none aligned to the STFT hop; a long hop keeps it from predicting
+    classifier = StreamClassifier(None, window=5.0, hop=60.0)
+    bounds = np.cumsum(rng.integers(100, 5000, size=len(audio) // 100))
+    for chunk in np.split(audio, bounds[bounds < len(audio)]):
+        assert classifier.feed(chunk) is None
+    streamed = classifier.features()
+
+    # Exactly the frames the stream has seen: un-centered librosa MFCCs over the same samples
+    frames = librosa.feature.mfcc(y=audio, sr=SAMPLE_RATE, n_mfcc=40, center=False)
+    np.testing.assert_allclose(streamed, frames.mean(axis=1), rtol=1e-3, atol=1e-2)
+    # And the upload path's centered MFCC mean differs only by the few padded edge frames
+    reference = mfcc_mean(audio, SAMPLE_RATE)
+    assert np.linalg.norm(streamed - reference) / np.linalg.norm(reference) < 0.05